@@ -0,0 +1,98 @@
+"""Generate synthetic, but realistic, Calendar events and org week files."""
+
+import datetime
+from pathlib import Path
+
+import numpy as np
+
+from monitoring import org, utils
+
+# Expected number of events per day and the range of their distances in km.
+# Sports without a range have no distance in their description.
+_SPORT_RATES = {
+    utils.Sport.running: (0.4, (3, 25)),
+    utils.Sport.cycling: (0.15, (15, 120)),
+    utils.Sport.swimming: (0.08, (0.5, 3)),
+    utils.Sport.hiking: (0.03, (5, 30)),
+    utils.Sport.gym_ub: (0.1, None),
+    utils.Sport.gym_lb: (0.1, None),
+    utils.Sport.gym_c: (0.05, None),
+    utils.Sport.yoga: (0.05, None),
+    utils.Sport.tennis: (0.02, None),
+    utils.Sport.climbing: (0.02, None),
+}
+_UTC_OFFSETS = ["+01:00", "+02:00", "Z", "-05:00"]
+_SCORES = ["0", "1", "2", "3", "4", "5"]
+# Headings in front of the days of a week file, see ``org._FIRST_WEEKDAY_INDEX``.
+_WEEK_PREAMBLE = "* Goals\n** Run 30km\n* Habits\n- Read\n* Notes\nBusy week.\n"
+
+
+def calendar_events(
+    n_years: int, last_date: datetime.date = datetime.date(2024, 12, 31), seed=0
+) -> list[dict]:
+    """Events of ``n_years`` as the Calendar API lists them, ordered by start."""
+    rng = np.random.default_rng(seed)
+    first_date = last_date.replace(year=last_date.year - n_years) + datetime.timedelta(
+        days=1
+    )
+    dates = np.arange(
+        np.datetime64(first_date), np.datetime64(last_date) + 1, dtype="datetime64[D]"
+    )
+    events = []
+    for sport, (rate, distance_range) in _SPORT_RATES.items():
+        n_events = rng.poisson(rate, len(dates))
+        days = np.repeat(dates, n_events)
+        hours = rng.integers(6, 21, len(days))
+        minutes = rng.choice([0, 15, 30, 45], len(days))
+        offsets = rng.choice(_UTC_OFFSETS, len(days))
+        if distance_range is not None:
+            distances = rng.uniform(*distance_range, len(days)).round(1)
+        for position, day in enumerate(days):
+            event = {
+                "kind": "calendar#event",
+                "status": "confirmed",
+                "summary": sport.value.capitalize(),
+                "start": {
+                    "dateTime": f"{day}T{hours[position]:02d}:"
+                    f"{minutes[position]:02d}:00{offsets[position]}"
+                },
+            }
+            if distance_range is not None:
+                event["description"] = f"{distances[position]} km\nFelt good."
+            events.append(event)
+    events.sort(key=lambda event: event["start"]["dateTime"])
+    for position, event in enumerate(events):
+        event["id"] = f"event{position}"
+    return events
+
+
+def _day(rng, date: datetime.date) -> str:
+    scores = rng.choice(_SCORES, len(org.PROPERTIES) - 1)
+    scores[rng.random(len(scores)) < 0.05] = "x"
+    fasting = "x" if rng.random() < 0.1 else str(rng.integers(0, 49) / 2)
+    properties = "".join(
+        f":{name}: {value}\n" for name, value in zip(org.PROPERTIES, [*scores, fasting])
+    )
+    return (
+        f"* {date:%A %Y-%m-%d}\n:PROPERTIES:\n{properties}:END:\n"
+        "** Journal\nA regular day.\n"
+    )
+
+
+def org_week_dirs(
+    root: Path, n_years: int, last_year: int = 2024, seed=0
+) -> list[Path]:
+    """Write 52 week files per year into directories like '24-weeks'."""
+    rng = np.random.default_rng(seed)
+    week_dirs = []
+    for year in range(last_year - n_years + 1, last_year + 1):
+        week_dir = root / f"{year % 100:02d}-weeks"
+        week_dir.mkdir(parents=True, exist_ok=True)
+        for week in range(1, 53):
+            days = "".join(
+                _day(rng, datetime.date.fromisocalendar(year, week, weekday))
+                for weekday in range(1, 8)
+            )
+            (week_dir / f"{week}.org").write_text(_WEEK_PREAMBLE + days)
+        week_dirs.append(week_dir)
+    return week_dirs
@@ -0,0 +1,236 @@
+"""Local stand-ins for the Calendar, GitHub and Telegram APIs.
+
+They serve synthetic data in the shape of the real responses, as far as this
+project reads them, and can add latency to every request. The load harness
+and the tests share them.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import re
+import threading
+import time
+from functools import partial
+from math import ceil
+
+import httplib2
+from googleapiclient.errors import HttpError
+from telegram.error import RetryAfter
+
+from monitoring import github
+
+# The Calendar API's default and maximal page sizes.
+_DEFAULT_PAGE_SIZE = 250
+_MAX_PAGE_SIZE = 2500
+# Every repository serves the same files.
+_REPOSITORY_URL = re.compile(r"^https://api\.github\.com/repos/[^/]+/[^/]+")
+
+
+class _CalendarRequest:
+    def __init__(self, function):
+        self.function = function
+
+    def execute(self):
+        return self.function()
+
+
+def _starts_between(event: dict, lower, upper) -> bool:
+    start = datetime.datetime.fromisoformat(event["start"]["dateTime"])
+    return (lower is None or start >= lower) and (upper is None or start <= upper)
+
+
+class CalendarService:
+    """Serve ``events().list`` from a list of events, page by page.
+
+    Incremental syncs see the events passed to ``update`` since their sync
+    token was issued. Unknown sync tokens are rejected as expired. The
+    arguments of all requests are kept in ``calls``.
+    """
+
+    def __init__(
+        self, events: list[dict], max_page_size=_MAX_PAGE_SIZE, latency: float = 0
+    ):
+        self.items = events
+        self.changes = []
+        self.max_page_size = max_page_size
+        self.latency = latency
+        self.calls = []
+        self.n_calls = 0
+        self._lock = threading.Lock()
+
+    def events(self):
+        return self
+
+    def update(self, events: list[dict]):
+        """Add, change or cancel events."""
+        ids = {event["id"] for event in events}
+        self.items = sorted(
+            [event for event in self.items if event["id"] not in ids]
+            + [event for event in events if event.get("status") != "cancelled"],
+            key=lambda event: event["start"]["dateTime"],
+        )
+        self.changes.append(events)
+
+    def _changes_since(self, sync_token: str) -> list[dict]:
+        version = sync_token.removeprefix("sync-")
+        if not version.isdigit() or int(version) > len(self.changes):
+            # Like the Calendar API, which signals expired tokens by '410 Gone'.
+            raise HttpError(httplib2.Response({"status": 410}), b"Gone")
+        return [event for events in self.changes[int(version) :] for event in events]
+
+    def _page(
+        self,
+        pageToken=None,
+        maxResults=None,
+        timeMin=None,
+        timeMax=None,
+        syncToken=None,
+        **kwargs,
+    ) -> dict:
+        time.sleep(self.latency)
+        with self._lock:
+            self.n_calls += 1
+        if syncToken is None:
+            lower, upper = [
+                None if bound is None else datetime.datetime.fromisoformat(bound)
+                for bound in [timeMin, timeMax]
+            ]
+            items = [
+                event for event in self.items if _starts_between(event, lower, upper)
+            ]
+        else:
+            items = self._changes_since(syncToken)
+        page_size = min(maxResults or _DEFAULT_PAGE_SIZE, self.max_page_size)
+        first = int(pageToken or 0)
+        page = {"items": items[first : first + page_size]}
+        if first + page_size < len(items):
+            page["nextPageToken"] = str(first + page_size)
+        else:
+            page["nextSyncToken"] = f"sync-{len(self.changes)}"
+        return page
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        return _CalendarRequest(partial(self._page, **kwargs))
+
+
+class _GitHubResponse:
+    def __init__(self, url: str, content: bytes = b"", json=None, status_code=200):
+        self.url = url
+        self.content = content
+        self.text = content.decode()
+        self._json = json
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            raise RuntimeError(f"{self.status_code} for {self.url}.")
+
+    def json(self):
+        return self._json
+
+
+class GitHubSession:
+    """Serve repositories with a single directory via the REST API endpoints.
+
+    Only the endpoints ``github.sync_directory`` uses are served: commits,
+    trees and raw blobs. The URLs of all requests are kept in ``urls``.
+    """
+
+    def __init__(self, directory: str, files: dict[str, bytes], latency: float = 0):
+        self.directory = directory
+        self.latency = latency
+        self.urls = []
+        self.n_bytes = 0
+        self._lock = threading.Lock()
+        self.push(files)
+
+    def push(self, files: dict[str, bytes]):
+        """Replace the files of the directory by a new commit."""
+        self.files = files
+        self.blobs = {
+            github._git_blob_sha(content): content for content in files.values()
+        }
+        self.commit = hashlib.sha1("".join(sorted(self.blobs)).encode()).hexdigest()
+
+    def _route(self, url: str) -> _GitHubResponse:
+        path = _REPOSITORY_URL.sub("", url)
+        if path.startswith("/commits/"):
+            return _GitHubResponse(url, self.commit.encode())
+        if path == f"/git/trees/{self.commit}":
+            tree = [{"path": self.directory, "type": "tree", "sha": "directory"}]
+            return _GitHubResponse(url, json={"tree": tree})
+        if path == "/git/trees/directory":
+            tree = [
+                {"path": name, "type": "blob", "sha": github._git_blob_sha(content)}
+                for name, content in self.files.items()
+            ]
+            return _GitHubResponse(url, json={"tree": tree})
+        if (sha := path.removeprefix("/git/blobs/")) in self.blobs:
+            return _GitHubResponse(url, self.blobs[sha])
+        return _GitHubResponse(url, status_code=404)
+
+    def get(self, url: str, headers: dict):
+        time.sleep(self.latency)
+        response = self._route(url)
+        with self._lock:
+            self.urls.append(url)
+            self.n_bytes += len(response.content)
+        return response
+
+    @property
+    def n_calls(self) -> int:
+        return len(self.urls)
+
+
+class TelegramBot:
+    """Record the messages and photos sent to chats.
+
+    Like Telegram, requests to a chat which follow the previous one within
+    ``1 / messages_per_second`` seconds are rejected with ``RetryAfter``.
+    The first ``n_rejections`` requests are rejected regardless.
+    """
+
+    def __init__(
+        self, latency: float = 0, messages_per_second: float = 1, n_rejections=0
+    ):
+        self.latency = latency
+        self.interval = 1 / messages_per_second
+        self.n_rejections = n_rejections
+        self.sent = []
+        self.n_rate_limits = 0
+        self.n_sessions = 0
+        self.n_in_flight = 0
+        self.max_in_flight = 0
+        self._last_request = {}
+
+    async def __aenter__(self):
+        self.n_sessions += 1
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def _send(self, chat_id, kind, payload):
+        now = time.monotonic()
+        last_request = self._last_request.get(chat_id, now - self.interval)
+        if self.n_rejections > 0:
+            self.n_rejections -= 1
+            self.n_rate_limits += 1
+            raise RetryAfter(0)
+        if (wait := last_request + self.interval - now) > 0:
+            self.n_rate_limits += 1
+            raise RetryAfter(ceil(wait))
+        self._last_request[chat_id] = now
+        self.n_in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.n_in_flight)
+        await asyncio.sleep(self.latency)
+        self.n_in_flight -= 1
+        self.sent.append((chat_id, kind, payload))
+
+    async def send_message(self, chat_id, text):
+        await self._send(chat_id, "message", text)
+
+    async def send_photo(self, chat_id, photo):
+        await self._send(chat_id, "photo", len(photo.read()))
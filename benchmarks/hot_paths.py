@@ -0,0 +1,195 @@
+"""Time the hot paths on synthetic histories of growing length.
+
+Usage: ``python -m benchmarks.hot_paths [--years 1 2 5 10 20] [--repetitions 3]
+[--output hot_paths.json] [--baseline hot_paths.json]``
+
+Every benchmark is run on 1 to 20 years of synthetic calendar events and org
+week files. The data is generated from fixed seeds, such that results are
+comparable across runs. Besides the median time per history length, the
+growth exponent between the shortest and longest history is reported: about
+1 for linear, about 2 for quadratic scaling.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import tempfile
+import time
+from math import log
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import data
+from monitoring import cal, org, utils, yearly
+
+_DEFAULT_YEARS = [1, 2, 5, 10, 20]
+
+
+def _time(function, repetitions: int) -> float:
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def _load_org(week_dirs: list[Path], **kwargs) -> pd.DataFrame:
+    return pd.concat(
+        [
+            org.load_data(max_week=52, week_root=week_dir, **kwargs)
+            for week_dir in week_dirs
+        ]
+    )
+
+
+def _process_org(df: pd.DataFrame) -> pd.DataFrame:
+    """Process the data of several years into a single, continuous history."""
+    df = org.process_data(df.reset_index(drop=True))
+    # Weeks are numbered from the first year on, such that the last week of
+    # the history is the 'current' one.
+    return df.assign(week=np.arange(len(df)) // 7 + 1)
+
+
+def _calendar_benchmarks(n_years: int) -> dict:
+    events = data.calendar_events(n_years)
+    df = cal.get_dataframe(events)
+    events_by_sport = cal.partition_events(events)
+    context = cal.EvaluationContext(
+        cal.get_dataframe(events_by_sport[utils.Sport.running])
+    )
+
+    benchmarks = {
+        "cal.get_dataframe": lambda: cal.get_dataframe(events),
+        "cal.get_cube": lambda: cal.get_cube(context.df),
+        "cal.get_streaks": lambda: cal.get_streaks(context.days),
+        "cal.streak": lambda: cal.streak(
+            cal.EvaluationContext(context.df), utils.Sport.running
+        ),
+        "cal.plot_cumulative_day_distances": lambda: (
+            cal.plot_cumulative_day_distances(context, utils.Sport.running)
+        ),
+        "yearly.variety": lambda: yearly.variety(df),
+    }
+    # The rules share the cube and streaks of a context, which are timed
+    # separately above.
+    for sport in utils.Sport:
+        if len(events_by_sport[sport]) == 0:
+            continue
+        sport_context = cal.EvaluationContext(cal.get_dataframe(events_by_sport[sport]))
+        sport_context.cube
+        sport_context.streaks
+        for interval in utils.TriggerInterval:
+            for function in cal.message_function_registry(sport, interval):
+                name = f"cal.{function.func.__name__}[{sport.value}]"
+                benchmarks[name] = lambda function=function, context=sport_context: (
+                    function(context)
+                )
+    return benchmarks
+
+
+def _org_benchmarks(n_years: int, root: Path) -> dict:
+    week_dirs = data.org_week_dirs(root / "weeks", n_years)
+    raw = _load_org(week_dirs)
+    df = _process_org(raw)
+    this_week = int(df["week"].iloc[-1])
+
+    def with_this_week(function):
+        def run():
+            with mock.patch.object(org, "_this_week", lambda: this_week):
+                return function(df)
+
+        return run
+
+    return {
+        "org.load_data": lambda: _load_org(week_dirs),
+        "org.load_data[orgparse]": lambda: _load_org(week_dirs, engine="orgparse"),
+        "org.process_data": lambda: _process_org(raw),
+        "org.messages_this_day": with_this_week(org.messages_this_day),
+        "org.messages_this_week": with_this_week(org.messages_this_week),
+    }
+
+
+def run(years: list[int], repetitions: int) -> dict[str, dict[int, float]]:
+    """Median durations in seconds per benchmark and number of years."""
+    results = {}
+    for n_years in years:
+        with tempfile.TemporaryDirectory() as root:
+            benchmarks = _calendar_benchmarks(n_years) | _org_benchmarks(
+                n_years, Path(root)
+            )
+            for name, function in benchmarks.items():
+                # The first call warms up caches, such as of the calendar
+                # dimension, which are shared across runs on warm instances.
+                function()
+                results.setdefault(name, {})[n_years] = _time(function, repetitions)
+        print(f"Measured {len(benchmarks)} benchmarks for {n_years} years.")
+    return results
+
+
+def growth_exponent(durations: dict[int, float]) -> float:
+    """Slope of the durations over the years in log-log space."""
+    if len(durations) < 2:
+        return float("nan")
+    (first_years, first), *_, (last_years, last) = sorted(durations.items())
+    return log(last / first) / log(last_years / first_years)
+
+
+def _report(results: dict, baseline: dict = None):
+    years = sorted({n_years for durations in results.values() for n_years in durations})
+    print(
+        f"{'benchmark':<50}"
+        + "".join(f"{f'{n_years}y [ms]':>12}" for n_years in years)
+        + f"{'exponent':>10}"
+        + ("" if baseline is None else f"{'vs base':>10}")
+    )
+    for name, durations in results.items():
+        line = (
+            f"{name:<50}"
+            + "".join(f"{1000 * durations[n_years]:>12.2f}" for n_years in years)
+            + f"{growth_exponent(durations):>10.2f}"
+        )
+        if baseline is not None and name in baseline:
+            n_years = years[-1]
+            if str(n_years) in baseline[name]:
+                line += f"{durations[n_years] / baseline[name][str(n_years)]:>10.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=_DEFAULT_YEARS)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Results of a previous run to compare the longest history with.",
+    )
+    args = parser.parse_args()
+
+    results = run(args.years, args.repetitions)
+    baseline = (
+        None
+        if args.baseline is None
+        else json.loads(args.baseline.read_text())["results"]
+    )
+    _report(results, baseline)
+    if args.output is not None:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "repetitions": args.repetitions,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
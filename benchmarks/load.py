@@ -0,0 +1,182 @@
+"""Replay triggers through ``main.main`` against local stand-ins of all APIs.
+
+Usage: ``python -m benchmarks.load [--runs 20] [--kinds org_daily ...]
+[--years 3] [--calendar-latency 0.1] [--github-latency 0.05]
+[--telegram-latency 0.05] [--messages-per-second 1] [--tenants 100]``
+
+Every run is a full trigger: payload parsing, fetching from the Calendar and
+GitHub stand-ins, evaluation, rendering and sending to the Telegram stand-in.
+The first run of every kind fills the caches of a cold instance and is
+reported separately from the p50 and p95 latency of the remaining, warm runs.
+With ``--tenants``, every run serves that many tenants at once.
+"""
+
+import argparse
+import base64
+import contextlib
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+import numpy as np
+
+import main
+from benchmarks import data, fakes
+from monitoring import delivery, setup
+
+KINDS = ["org_daily", "org_weekly", "calendar_daily", "calendar_weekly"]
+_WEEK_DIR = "24-weeks"
+_ENVIRONMENT = {
+    "telegram_owner_id": "1",
+    "github_username": "user",
+    "github_repo": "org-journal",
+    "github_ref": "main",
+    "github_pat": "pat",
+}
+
+
+def payload(kind: str) -> dict:
+    """A Pub/Sub message as it triggers ``main.main``."""
+    return {"data": base64.b64encode(json.dumps({"kind": kind}).encode()).decode()}
+
+
+@dataclass
+class StandIns:
+    calendar: fakes.CalendarService
+    github: fakes.GitHubSession
+    telegram: fakes.TelegramBot
+
+
+@contextlib.contextmanager
+def offline(
+    root: Path,
+    n_years: int = 3,
+    calendar_latency: float = 0,
+    github_latency: float = 0,
+    telegram_latency: float = 0,
+    messages_per_second: float = 1,
+    max_page_size: int = 2500,
+    n_tenants: Optional[int] = None,
+):
+    """Point ``main.main`` at stand-ins serving synthetic data.
+
+    Temporary files and caches are kept in ``root``. ``messages_per_second``
+    is the rate both ``delivery.send`` and the Telegram stand-in allow. With
+    ``n_tenants``, a registry of tenants with their own chats and repositories
+    is set up; all of them see the same data.
+    """
+    events = data.calendar_events(n_years, last_date=datetime.date.today())
+    # ``setup.create_and_get_week_dir`` mirrors the week files of 2024.
+    week_dir = data.org_week_dirs(root / "repository", n_years=1, last_year=2024)[0]
+    stand_ins = StandIns(
+        calendar=fakes.CalendarService(
+            events, max_page_size=max_page_size, latency=calendar_latency
+        ),
+        github=fakes.GitHubSession(
+            _WEEK_DIR,
+            {path.name: path.read_bytes() for path in week_dir.glob("*.org")},
+            latency=github_latency,
+        ),
+        telegram=fakes.TelegramBot(
+            latency=telegram_latency, messages_per_second=messages_per_second
+        ),
+    )
+    environment = _ENVIRONMENT | {"event_store_dir": str(root / "events")}
+    if n_tenants is not None:
+        tenants_file = root / "tenants.json"
+        tenants_file.write_text(
+            json.dumps(
+                {
+                    f"tenant{tenant}": {
+                        "telegram_owner_id": str(tenant),
+                        "github_username": f"user{tenant}",
+                    }
+                    for tenant in range(n_tenants)
+                }
+            )
+        )
+        environment["tenants_file"] = str(tenants_file)
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.dict(os.environ, environment))
+        for name, value in [
+            ("get_calendar_service", stand_ins.calendar),
+            ("get_http_session", stand_ins.github),
+            ("get_bot", stand_ins.telegram),
+            ("get_tmpdir", root / "tmp"),
+        ]:
+            stack.enter_context(
+                mock.patch.object(setup, name, lambda value=value: value)
+            )
+        stack.enter_context(
+            mock.patch.object(
+                delivery,
+                "send",
+                partial(delivery.send, messages_per_second=messages_per_second),
+            )
+        )
+        yield stand_ins
+
+
+def drive(kinds: list[str], n_runs: int, **kwargs) -> dict[str, list[float]]:
+    """Run every kind of trigger ``n_runs`` times, interleaved.
+
+    Returns the durations in seconds per kind. ``kwargs`` are passed on to
+    ``offline``.
+    """
+    durations = {kind: [] for kind in kinds}
+    with tempfile.TemporaryDirectory() as root, offline(Path(root), **kwargs):
+        for _ in range(n_runs):
+            for kind in kinds:
+                start = time.perf_counter()
+                # The log lines of the runs would drown the report.
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main.main(payload(kind), None)
+                durations[kind].append(time.perf_counter() - start)
+    return durations
+
+
+def _report(durations: dict[str, list[float]]):
+    print(f"{'trigger':<16}{'cold [s]':>10}{'p50 [s]':>10}{'p95 [s]':>10}")
+    for kind, values in durations.items():
+        warm = values[1:] or values
+        print(
+            f"{kind:<16}{values[0]:>10.3f}"
+            f"{np.percentile(warm, 50):>10.3f}{np.percentile(warm, 95):>10.3f}"
+        )
+    n_runs = sum(len(values) for values in durations.values())
+    total = sum(sum(values) for values in durations.values())
+    print(f"{n_runs} runs in {total:.1f}s, {n_runs / total:.2f} runs per second.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--calendar-latency", type=float, default=0.1)
+    parser.add_argument("--github-latency", type=float, default=0.05)
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--messages-per-second", type=float, default=1)
+    parser.add_argument("--tenants", type=int, default=None)
+    args = parser.parse_args()
+
+    _report(
+        drive(
+            args.kinds,
+            args.runs,
+            n_years=args.years,
+            calendar_latency=args.calendar_latency,
+            github_latency=args.github_latency,
+            telegram_latency=args.telegram_latency,
+            messages_per_second=args.messages_per_second,
+            n_tenants=args.tenants,
+        )
+    )
@@ -0,0 +1,172 @@
+"""Measure the import time of every trigger kind in a fresh interpreter.
+
+Usage: ``python -m benchmarks.startup [--repetitions 5] [--output startup.json]``
+
+The imports of every kind are traced by running it through ``main.main``
+against the stand-ins of ``benchmarks.load``, in an interpreter of its own.
+"""
+
+import argparse
+import builtins
+import contextlib
+import importlib.util
+import io
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import main
+from benchmarks import load
+from monitoring import setup
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+# The real clients are built, which needs neither a request nor valid
+# credentials, such that their imports are traced as well.
+_CLIENT_ENVIRONMENT = {
+    "telegram_token": "123:token",
+    "google_client_id": "client-id",
+    "google_client_secret": "client-secret",
+    "google_refresh_token": "refresh-token",
+    "google_token_uri": "https://oauth2.googleapis.com/token",
+}
+
+
+@contextlib.contextmanager
+def _recording_imports(modules: dict):
+    """Add the name of every module imported by an import statement to ``modules``.
+
+    Modules which are imported already are recorded as well.
+    """
+    import_ = builtins.__import__
+
+    def record(name, globals=None, locals=None, fromlist=(), level=0):
+        module = import_(name, globals, locals, fromlist, level)
+        if level > 0:
+            name = importlib.util.resolve_name(
+                "." * level + name, globals["__package__"]
+            )
+        modules[name] = None
+        for item in fromlist or ():
+            if f"{name}.{item}" in sys.modules:
+                modules[f"{name}.{item}"] = None
+        return module
+
+    with mock.patch.object(builtins, "__import__", record):
+        yield
+
+
+def trace_imports(kind: str) -> list[str]:
+    """The modules imported while running a ``kind`` trigger through ``main.main``.
+
+    Runs in the current interpreter, see ``traced_imports`` for a fresh one.
+    """
+    modules = {}
+    # ``load.offline`` replaces the getters of the clients.
+    getters = {
+        name: getattr(setup, name)
+        for name in ["get_bot", "get_calendar_service", "get_http_session"]
+    }
+    with contextlib.ExitStack() as stack:
+        root = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        stand_ins = stack.enter_context(
+            load.offline(root, n_years=1, messages_per_second=1000)
+        )
+        stack.enter_context(mock.patch.dict("os.environ", _CLIENT_ENVIRONMENT))
+        # The clients are created but the stand-ins are used in their stead.
+        stand_in_by_client = {
+            "telegram": stand_ins.telegram,
+            "calendar": stand_ins.calendar,
+            "http": stand_ins.github,
+        }
+        get_client = setup._get_client
+
+        def get_stand_in(key, factory, shared=False):
+            client = get_client(key, factory, shared=shared)
+            return stand_in_by_client.get(key[0], client)
+
+        for name, getter in getters.items():
+            stack.enter_context(mock.patch.object(setup, name, getter))
+        stack.enter_context(mock.patch.object(setup, "_get_client", get_stand_in))
+        # The log lines of the run would end up in the output.
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        with _recording_imports(modules):
+            main.main(load.payload(kind), None)
+    return [module for module in modules if module != "__main__"]
+
+
+def traced_imports(kind: str) -> list[str]:
+    """``trace_imports`` in a fresh interpreter."""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--trace", kind],
+        cwd=_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def _parse_importtime(stderr: str) -> dict[str, float]:
+    """Cumulative import time in seconds of all top-level imports."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        # Nested imports are indented by further spaces.
+        if not name.startswith("  "):
+            cumulative[name.strip()] = int(cumulative_us) / 1e6
+    return cumulative
+
+
+def measure(code: str) -> dict:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_time = time.perf_counter() - start
+    imports = _parse_importtime(completed.stderr)
+    return {"wall_time": wall_time, "import_time": sum(imports.values())}
+
+
+def run(repetitions: int) -> dict:
+    results = {}
+    for kind in load.KINDS:
+        code = "import main; import " + ", ".join(traced_imports(kind))
+        measurements = [measure(code) for _ in range(repetitions)]
+        results[kind] = {
+            key: statistics.median(measurement[key] for measurement in measurements)
+            for key in ["wall_time", "import_time"]
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--trace", choices=load.KINDS, default=None)
+    args = parser.parse_args()
+
+    if args.trace is not None:
+        print(json.dumps(trace_imports(args.trace)))
+        sys.exit()
+
+    results = run(args.repetitions)
+    for kind, result in results.items():
+        print(
+            f"{kind:>16}: imports {result['import_time']:.3f}s, "
+            f"interpreter incl. imports {result['wall_time']:.3f}s"
+        )
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
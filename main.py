@@ -1,122 +1,218 @@
-import asyncio
+import io
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from monitoring import cal, org, setup, utils
+# Only the standard library, ``tracing`` and ``utils`` are imported eagerly.
+# Every trigger kind imports the modules it needs, such that e.g. an
+# 'org_daily' trigger neither loads the Calendar client nor matplotlib.
+from monitoring import tracing, utils
 
 _FIRST_YEAR = 2023
 
 
-async def send_message(bot, chat_id, message):
-    await bot.send_message(chat_id=chat_id, text=message)
-
-
-async def send_messages(bot, chat_id, messages):
-    async with bot:
-        tasks = [send_message(bot, chat_id, message) for message in messages]
-        await asyncio.gather(*tasks)
-
-
-async def send_photo(bot, chat_id, photo):
-    await bot.send_photo(chat_id=chat_id, photo=photo)
-
-
-async def send_photos(bot, chat_id, photos):
-    async with bot:
-        tasks = [send_photo(bot, chat_id, photo) for photo in photos]
-        await asyncio.gather(*tasks)
-
-
 def org_log(interval: utils.TriggerInterval):
-    weeks_dir = setup.create_and_get_week_dir()
-    df = org.load_data(week_root=weeks_dir, first_weekday_index=3)
-    df = org.process_data(df)
-
-    if interval == utils.TriggerInterval.weekly:
-        messages = org.messages_this_week(df)
-        image_paths = org.images_this_week(df, path=weeks_dir)
-    elif interval == utils.TriggerInterval.daily:
-        messages = org.messages_this_day(df)
-        image_paths = []
-    else:
-        raise ValueError(f"Unexpected TriggerInterval for org_log: {interval}.")
-
-    print(f"Generated messages: {messages}.")
-    print(f"Generated images: {image_paths}.")
-
-    bot = setup.get_bot()
-    owner_id = setup.get_telegram_owner_id()
-
-    asyncio.run(send_messages(bot, owner_id, messages))
-    asyncio.run(
-        send_photos(
-            bot, owner_id, (open(image_path, "rb") for image_path in image_paths)
-        )
-    )
-
-
-def gcal(interval: utils.TriggerInterval):
-    bot = setup.get_bot()
-    owner_id = setup.get_telegram_owner_id()
-    service = setup.get_calendar_service()
-    start = utils.first_of_jan_timestamp(year=_FIRST_YEAR)
-    end = utils.now_timestamp()
-
-    for sport in utils.Sport:
-        df = cal.get_dataframe(
-            cal.get_filtered_events(
-                service,
-                start,
-                end,
-                "summary",
-                filter_value=sport,
+    from monitoring import delivery, org, setup
+
+    with tracing.stage("fetch"):
+        weeks_dir = setup.create_and_get_week_dir()
+    with tracing.stage("parse"):
+        with setup.get_executor("org") as executor:
+            df = org.load_data(
+                week_root=weeks_dir,
+                first_weekday_index=3,
+                executor=executor,
             )
+        df = org.process_data(df)
+        tracing.count("rows", len(df))
+        year = org.year_of_week_dir(weeks_dir)
+        if (day_store := setup.get_day_store()) is not None:
+            day_store.save_year(year, org.with_dates(df, year))
+
+    with tracing.stage("compute"):
+        # The weekly trigger is rare enough to check the running statistics.
+        statistics = org.baseline_statistics(
+            df,
+            setup.get_statistics_store(year),
+            verify=interval == utils.TriggerInterval.weekly,
         )
+        if interval == utils.TriggerInterval.weekly:
+            messages = org.messages_this_week(df, statistics=statistics)
+        elif interval == utils.TriggerInterval.daily:
+            messages = org.messages_this_day(df, statistics=statistics)
+        else:
+            raise ValueError(f"Unexpected TriggerInterval for org_log: {interval}.")
+    with tracing.stage("render"):
+        if interval == utils.TriggerInterval.weekly:
+            images = org.images_this_week(df)
+        else:
+            images = []
+
+    tracing.log(f"Generated messages: {messages}.")
+    tracing.log(f"Generated images: {[image.name for image in images]}.")
+
+    outbox = delivery.Outbox()
+    outbox.add_messages(messages)
+    outbox.add_photos(images)
+    with tracing.stage("send"):
+        delivery.send(setup.get_bot(), setup.get_telegram_owner_id(), outbox)
+
+
+def evaluate_sport(
+    sport: utils.Sport, events: list, interval: utils.TriggerInterval
+) -> tuple[list[str], list[io.BytesIO]]:
+    """Generate the messages and images for a single sport."""
+    from monitoring import cal
+
+    with tracing.stage("parse", sport=sport.value):
+        df = cal.get_dataframe(events)
+        tracing.count("rows", len(df))
+
+    if len(df) == 0:
+        tracing.log(f"No {sport.value} event at all.", sport=sport.value)
+        return [], []
+
+    context = cal.EvaluationContext(df)
+    if not cal.has_time_relevant_event(context, interval=interval):
+        tracing.log(
+            f"No event for {interval.value} {sport.value} during this past time "
+            "interval.",
+            sport=sport.value,
+        )
+        return [], []
 
-        if len(df) == 0 or not cal.has_time_relevant_event(df, interval=interval):
-            print(
-                f"No event for {interval.value} {sport.value} during this past time interval."
-            )
-            continue
-
+    with tracing.stage("compute", sport=sport.value):
         messages = [
-            message_function(df)
+            message_function(context)
             for message_function in cal.message_function_registry(sport, interval)
         ]
-        print(f"Generated messages for {interval.value} {sport.value}: {messages}.")
-
-        messages = filter(lambda x: x is not None and x != "", messages)
-
-        asyncio.run(send_messages(bot, owner_id, messages))
+    tracing.log(
+        f"Generated messages for {interval.value} {sport.value}: {messages}.",
+        sport=sport.value,
+    )
 
-        tmpdir = setup.get_tmpdir()
-        image_paths = [
-            image_function(df)
-            for image_function in cal.image_function_registry(
-                sport, interval, path=tmpdir
-            )
+    with tracing.stage("render", sport=sport.value):
+        images = [
+            image_function(context)
+            for image_function in cal.image_function_registry(sport, interval)
         ]
-        print(f"Generated images for {interval.value} {sport.value}: {image_paths}.")
+    tracing.log(
+        f"Generated images for {interval.value} {sport.value}: "
+        f"{[image.name for image in images if image is not None]}.",
+        sport=sport.value,
+    )
+
+    return (
+        [message for message in messages if message is not None and message != ""],
+        [image for image in images if image is not None],
+    )
 
-        image_paths = filter(lambda x: x is not None, image_paths)
 
-        asyncio.run(
-            send_photos(
-                bot, owner_id, (open(image_path, "rb") for image_path in image_paths)
+def gcal(interval: utils.TriggerInterval):
+    from monitoring import cal, delivery, setup
+
+    with tracing.stage("fetch"):
+        service = setup.get_calendar_service()
+        start = utils.first_of_jan_timestamp(year=_FIRST_YEAR)
+        end = utils.now_timestamp()
+
+        # Fetch the calendar once and partition it rather than once per sport.
+        if (event_store := setup.get_event_store()) is None:
+            events = cal.get_events(service, start, end)
+        else:
+            events = cal.sync_events(service, event_store, start, end)
+        events_by_sport = cal.partition_events(events)
+
+    # Sports are evaluated concurrently but sent in a fixed order. A failing
+    # sport, e.g. due to an invalid event, doesn't affect the others.
+    sports = [sport for sport in utils.Sport if len(events_by_sport[sport]) > 0]
+    results = []
+    with setup.get_executor() as executor:
+        futures = [
+            setup.submit(
+                executor, evaluate_sport, sport, events_by_sport[sport], interval
             )
-        )
+            for sport in sports
+        ]
+        for sport, future in zip(sports, futures):
+            try:
+                results.append(future.result())
+            except Exception as error:
+                tracing.log(
+                    f"Evaluation failed for {sport.value}: {error!r}",
+                    severity="ERROR",
+                    sport=sport.value,
+                    traceback=traceback.format_exc(),
+                )
+
+    outbox = delivery.Outbox()
+    for messages, images in results:
+        outbox.add_messages(messages)
+        outbox.add_photos(images)
+    with tracing.stage("send"):
+        delivery.send(setup.get_bot(), setup.get_telegram_owner_id(), outbox)
+
+
+def _get_trigger(kind: str):
+    if kind == "org_daily":
+        return partial(org_log, utils.TriggerInterval.daily)
+    if kind == "org_weekly":
+        return partial(org_log, utils.TriggerInterval.weekly)
+    if kind == "calendar_daily":
+        return partial(gcal, utils.TriggerInterval.daily)
+    if kind == "calendar_weekly":
+        return partial(gcal, utils.TriggerInterval.weekly)
+    raise ValueError(f"Unexpected kind of request: {kind}.")
+
+
+def fan_out(trigger, tenants: list, max_workers: int) -> list[str]:
+    """Run a trigger for every tenant, at most ``max_workers`` at once.
+
+    The tenants are mostly waiting for the APIs, hence threads. A failing
+    tenant doesn't affect the others. Returns the names of the failed tenants.
+    """
+    from monitoring import setup
+
+    def run(tenant) -> bool:
+        with setup.tenant_context(tenant), tracing.context_fields(tenant=tenant.name):
+            try:
+                trigger()
+            except Exception as error:
+                tracing.log(
+                    f"Trigger failed for tenant {tenant.name}: {error!r}",
+                    severity="ERROR",
+                    traceback=traceback.format_exc(),
+                )
+                return False
+        return True
+
+    # The tenants' threads inherit the fields of the run, such as the trigger.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [setup.submit(executor, run, tenant) for tenant in tenants]
+        succeeded = [future.result() for future in futures]
+    failed = [tenant.name for tenant, ok in zip(tenants, succeeded) if not ok]
+    tracing.log(
+        f"Ran the trigger for {len(tenants)} tenants, {len(failed)} failed.",
+        severity="ERROR" if len(failed) > 0 else "INFO",
+        failed_tenants=failed,
+    )
+    return failed
 
 
 def main(request, context):
-    kind = utils.parse_payload(request)
-    if kind == "org_daily":
-        org_log(utils.TriggerInterval.daily)
-    elif kind == "org_weekly":
-        org_log(utils.TriggerInterval.weekly)
-    elif kind == "calendar_daily":
-        gcal(utils.TriggerInterval.daily)
-    elif kind == "calendar_weekly":
-        gcal(utils.TriggerInterval.weekly)
-    else:
-        raise ValueError(f"Unexpected kind of request: {kind}.")
+    from monitoring import setup
+
+    with tracing.run():
+        with tracing.stage("parse_payload"):
+            kind = utils.parse_payload(request)
+        tracing.set_fields(trigger=kind)
+        trigger = _get_trigger(kind)
+        # Without a registry of tenants, the environment configures the only
+        # user.
+        if (tenants := setup.get_tenants()) is None:
+            trigger()
+        else:
+            fan_out(trigger, tenants, setup.get_tenant_max_workers())
 
 
 if __name__ == "__main__":
@@ -4,61 +4,61 @@
 # functions such as ``running_previous_year``.
 
 import datetime
-from functools import partial
-from pathlib import Path
-from typing import Union
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cache, cached_property, partial
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import pydantic
 
-from . import utils
+from . import images, tracing, utils
 
+# The Calendar API doesn't return more than 2500 events per page.
+_PAGE_SIZE = 2500
+# Only request the fields which are used downstream.
+_EVENT_FIELDS = (
+    "nextPageToken,nextSyncToken,"
+    "items(id,status,start/dateTime,summary,description,colorId)"
+)
 
-def _current_date(df):
-    return df.index.max()
+_GYM_KINDS = [utils.Sport.gym_c, utils.Sport.gym_lb, utils.Sport.gym_ub]
 
 
-def _current_year(df):
-    return df[df.index == _current_date(df)]["year"].iloc[0]
+def _get_sport_lookup() -> dict[str, list[utils.Sport]]:
+    """Map a lower-cased event summary to all sports it belongs to."""
+    # Running and Cycling events are excatly called as just spelled.
+    # Some social, non-desired events are called 'Running w/ friend'
+    # and should not be considered.
+    lookup = {sport.value: [sport] for sport in utils.Sport}
+    # If generic 'gym' is given, we want to select any kind of gym event.
+    for gym_kind in _GYM_KINDS:
+        lookup[gym_kind.value].append(utils.Sport.gym)
+    return lookup
 
 
-def _current_month(df):
-    return df[df.index == _current_date(df)]["month"].iloc[0]
+_SPORT_LOOKUP = _get_sport_lookup()
 
 
-def _current_week(df):
-    return df[df.index == _current_date(df)]["week"].iloc[0]
-
-
-def _previous_month(df):
-    # Returning 0 for January is currently intended.
-    current_month = _current_month(df)
-    return current_month - 1
+def classify_event(event) -> list[utils.Sport]:
+    if "summary" not in event:
+        return []
+    return _SPORT_LOOKUP.get(event["summary"].lower(), [])
 
 
-def _distance_last_event(df):
-    # There could be several events on the given date, hence the sum.
-    return df[df.index == _current_date(df)]["distance"].sum()
+def partition_events(events) -> dict[utils.Sport, list]:
+    """Partition events into one bucket per sport in a single pass."""
+    partitions = {sport: [] for sport in utils.Sport}
+    for event in events:
+        for sport in classify_event(event):
+            partitions[sport].append(event)
+    return partitions
 
 
 def _get_summary_filter(sport: utils.Sport):
     def summary_filter(event):
-        # If generic 'gym' is given, we want to select any kind of gym event.
-        if sport == utils.Sport.gym:
-            return "summary" in event and event["summary"].lower() in [
-                utils.Sport.gym.value,
-                utils.Sport.gym_c.value,
-                utils.Sport.gym_lb.value,
-                utils.Sport.gym_ub.value,
-            ]
-        return (
-            "summary" in event
-            # Running and Cycling events are excatly called as just spelled.
-            # Some social, non-desired events are called 'Running w/ friend'
-            # and should not be considered.
-            and event["summary"].lower() == sport.value
-        )
+        return sport in classify_event(event)
 
     return summary_filter
 
@@ -70,94 +70,358 @@ def _get_color_filter(color):
     return color_filter
 
 
+def _list_pages(service, **kwargs):
+    """Iterate over all response pages of an ``events().list`` request.
+
+    Pages are as large as the API allows, for full and incremental syncs
+    alike. While a page is being consumed, the next page is already
+    downloaded in the background.
+    """
+
+    def fetch(page_token):
+        return (
+            service.events()
+            .list(
+                calendarId="primary",
+                pageToken=page_token,
+                maxResults=_PAGE_SIZE,
+                fields=_EVENT_FIELDS,
+                **kwargs,
+            )
+            .execute()
+        )
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch, None)
+        while True:
+            response = future.result()
+            tracing.count("calendar_api_calls")
+            tracing.count("calendar_events", len(response.get("items", [])))
+            page_token = response.get("nextPageToken")
+            if page_token is not None:
+                future = executor.submit(fetch, page_token)
+            yield response
+            if page_token is None:
+                return
+
+
 def get_events(service, timestamp_start, timestamp_end):
-    events_result = (
-        service.events()
-        .list(
-            calendarId="primary",
-            timeMin=timestamp_start,
-            timeMax=timestamp_end,
-            maxResults=100000,
-            singleEvents=True,
-            orderBy="startTime",
+    """Lazily yield all events between both timestamps, page by page."""
+    for page in _list_pages(
+        service,
+        timeMin=timestamp_start,
+        timeMax=timestamp_end,
+        singleEvents=True,
+        orderBy="startTime",
+    ):
+        yield from page.get("items", [])
+
+
+def normalize_event(event) -> dict:
+    """Reduce an event to the fields required downstream."""
+    normalized = {
+        key: event[key]
+        for key in ["id", "summary", "description", "colorId"]
+        if key in event
+    }
+    if "dateTime" in event.get("start", {}):
+        normalized["start"] = {"dateTime": event["start"]["dateTime"]}
+    return normalized
+
+
+def merge_events(events: dict[str, dict], changes) -> dict[str, dict]:
+    """Merge changed and deleted events into a store of events keyed by id."""
+    for change in changes:
+        if change.get("status") == "cancelled":
+            events.pop(change["id"], None)
+        else:
+            events[change["id"]] = normalize_event(change)
+    return events
+
+
+def _fetch_changes(service, sync_token, timestamp_start):
+    if sync_token is None:
+        # Sync tokens can't be combined with ordering or an upper time bound.
+        kwargs = {"timeMin": timestamp_start}
+    else:
+        kwargs = {"syncToken": sync_token}
+    changes = []
+    next_sync_token = None
+    for page in _list_pages(service, singleEvents=True, **kwargs):
+        changes.extend(page.get("items", []))
+        next_sync_token = page.get("nextSyncToken", next_sync_token)
+    return changes, next_sync_token
+
+
+def _starts_before(event, timestamp) -> bool:
+    start = event.get("start", {}).get("dateTime")
+    return start is None or datetime.datetime.fromisoformat(
+        start
+    ) <= datetime.datetime.fromisoformat(timestamp)
+
+
+def sync_events(service, event_store, timestamp_start, timestamp_end):
+    """Fetch only events changed since the last run and merge them into the store.
+
+    If the store holds no sync token yet or if the Calendar API reports the
+    sync token as expired, a full sync starting at ``timestamp_start`` is done.
+    The returned events are ordered by start time and do not start after
+    ``timestamp_end``.
+    """
+    from googleapiclient.errors import HttpError
+
+    sync_token = event_store.load_sync_token()
+    try:
+        changes, next_sync_token = _fetch_changes(service, sync_token, timestamp_start)
+    except HttpError as error:
+        # An expired sync token is signalled by '410 Gone'.
+        if sync_token is None or error.resp.status != 410:
+            raise
+        tracing.log(
+            "Calendar sync token expired, falling back to a full sync.",
+            severity="WARNING",
         )
-        .execute()
+        sync_token = None
+        changes, next_sync_token = _fetch_changes(service, None, timestamp_start)
+
+    events = {} if sync_token is None else event_store.load_events()
+    events = merge_events(events, changes)
+    event_store.save(events, next_sync_token)
+
+    return sorted(
+        (event for event in events.values() if _starts_before(event, timestamp_end)),
+        key=lambda event: event.get("start", {}).get("dateTime", ""),
     )
-    return events_result.get("items", [])
+
+
+class EvaluationContext:
+    """The events of a single sport, prepared once for the evaluation of all rules.
+
+    The events are sorted by date such that date ranges can be selected via
+    binary search, returning slices instead of copies created by boolean masks.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df if df.index.is_monotonic_increasing else df.sort_index()
+        self.index = self.df.index
+
+    @cached_property
+    def current_date(self) -> pd.Timestamp:
+        return self.index[-1]
+
+    @cached_property
+    def current_year(self) -> int:
+        return int(self.df["year"].iloc[-1])
+
+    @cached_property
+    def current_month(self) -> int:
+        return int(self.df["month"].iloc[-1])
+
+    @cached_property
+    def current_week(self) -> int:
+        return int(self.df["week"].iloc[-1])
+
+    @cached_property
+    def cube(self) -> "AggregationCube":
+        return get_cube(self.df)
+
+    @cached_property
+    def days(self) -> np.ndarray:
+        """Sorted, unique days with at least one event."""
+        return np.unique(self.index.tz_convert(None).to_numpy().astype("datetime64[D]"))
+
+    @cached_property
+    def streaks(self) -> "Streaks":
+        return get_streaks(self.days)
+
+    def between(self, start=None, end=None) -> pd.DataFrame:
+        """Events from ``start`` (included) to ``end`` (excluded)."""
+        first = 0 if start is None else self.index.searchsorted(start, side="left")
+        last = len(self.index) if end is None else self.index.searchsorted(end)
+        return self.df.iloc[first:last]
+
+    def on_day(self, date: datetime.date) -> pd.DataFrame:
+        start = pd.Timestamp(date, tz="UTC")
+        return self.between(start, start + pd.Timedelta(days=1))
+
+    def in_week(self, date: datetime.date) -> pd.DataFrame:
+        """Events of the ISO week containing ``date``."""
+        start = pd.Timestamp(date, tz="UTC") - pd.Timedelta(days=date.weekday())
+        return self.between(start, start + pd.Timedelta(days=7))
+
+    def in_year(self, year: int) -> pd.DataFrame:
+        return self.between(
+            pd.Timestamp(year=year, month=1, day=1, tz="UTC"),
+            pd.Timestamp(year=year + 1, month=1, day=1, tz="UTC"),
+        )
 
 
 def get_time_relevant_events(
-    df, interval: utils.TriggerInterval, date: datetime.date = datetime.date.today()
+    context: EvaluationContext,
+    interval: utils.TriggerInterval,
+    date: datetime.date = None,
 ):
+    # Defaults are evaluated only once, which would go stale on warm instances.
+    if date is None:
+        date = datetime.date.today()
     if interval == utils.TriggerInterval.daily:
-        return df[
-            (df["year"] == date.year)
-            & (df["month"] == date.month)
-            & (df["day"] == date.day)
-        ]
+        return context.on_day(date)
     if interval == utils.TriggerInterval.weekly:
-        return df[(df["year"] == date.year) & (df["week"] == date.isocalendar().week)]
+        return context.in_week(date)
     raise ValueError(f"Unexpected TriggerInterval: {interval}.")
 
 
 def has_time_relevant_event(
-    df, interval: utils.TriggerInterval, date: datetime.date = datetime.date.today()
+    context: EvaluationContext,
+    interval: utils.TriggerInterval,
+    date: datetime.date = None,
 ):
-    return len(get_time_relevant_events(df, interval, date)) > 0
+    return len(get_time_relevant_events(context, interval, date)) > 0
 
 
 def get_dataframe(events) -> pd.DataFrame:
-    df = pd.DataFrame(data=prune_events(events))
+    df = _events_to_frame(events)
     if len(df) == 0:
         return df
 
-    df["date"] = pd.to_datetime(df["date_string"], utc=True)
-    df["day"] = df["date"].dt.day
-    df["week"] = df["date"].dt.isocalendar().week
-    df["month"] = df["date"].dt.month
-    df["year"] = df["date"].dt.year
-    df["day_of_year"] = df["date"].dt.dayofyear
-    df["hour"] = df["date"].dt.hour
+    calendar = _calendar_dimension(
+        df["date_string"].dt.year.min(), df["date_string"].dt.year.max()
+    )
+    day_ordinals = (
+        df["date_string"].dt.tz_localize(None).to_numpy().astype("datetime64[D]")
+        - _EPOCH
+    ).astype(int) - calendar.index[0]
+    df = pd.concat(
+        [df, calendar.iloc[day_ordinals].reset_index(drop=True)], axis="columns"
+    )
+    df["hour"] = df["date_string"].dt.hour.astype("int32")
+    df = df[_COLUMNS]
+    df.index = pd.DatetimeIndex(df["date_string"], name="date")
 
-    df = df.set_index("date", drop=True, append=False)
+    return df
 
-    df["distance"] = pd.to_numeric(df["distance"])
 
-    return df
+_EPOCH = np.datetime64("1970-01-01", "D")
+_COLUMNS = [
+    "date_string",
+    "distance",
+    "title",
+    "day",
+    "week",
+    "month",
+    "year",
+    "day_of_year",
+    "hour",
+]
+# Swimming distance can be very short, cycling distance very long.
+_MIN_DISTANCE = 0.1
+_MAX_DISTANCE = 250
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+_UTC_OFFSET_PATTERN = re.compile(r"^(?:Z|([+-])(\d{2}):(\d{2}))$")
+# Everything in front of 'km', without surrounding whitespace.
+_DISTANCE_PATTERN = r"^\s*(.*?)\s*km"
+_SPORT_VALUES = [sport.value for sport in utils.Sport]
+
+
+@cache
+def _calendar_dimension(first_year: int, last_year: int) -> pd.DataFrame:
+    """Calendar attributes of every day, indexed by the days since the epoch."""
+    days = pd.date_range(f"{first_year}-01-01", f"{last_year}-12-31", freq="D")
+    return pd.DataFrame(
+        {
+            "day": days.day.astype("int32"),
+            "week": days.isocalendar()["week"].astype("UInt32").array,
+            "month": days.month.astype("int32"),
+            "year": days.year.astype("int32"),
+            "day_of_year": days.dayofyear.astype("int32"),
+        },
+        index=(days.to_numpy().astype("datetime64[D]") - _EPOCH).astype(int),
+    )
 
 
-class EventDatum(pydantic.BaseModel):
-    date_string: datetime.datetime
-    # Swimming distance can be very short, cycling distance very long.
-    distance: Union[pydantic.confloat(ge=0.1, le=250), None]
-    title: utils.Sport
+def _utc_offset_minutes(suffix: str) -> int:
+    if (match := _UTC_OFFSET_PATTERN.match(suffix)) is None:
+        raise ValueError(f"Unexpected UTC offset: {suffix}.")
+    if match.group(1) is None:
+        return 0
+    sign = -1 if match.group(1) == "-" else 1
+    return sign * (60 * int(match.group(2)) + int(match.group(3)))
 
-    # This is necessary to prevent the entire enum to be stored instead of its value.
-    # https://stackoverflow.com/questions/65209934/pydantic-enum-field-does-not-get-converted-to-string
-    class Config:
-        use_enum_values = True
 
+def _parse_dates(date_strings: pd.Series) -> pd.Series:
+    """Parse Calendar date times of the form ``2020-01-01T08:30:00+01:00`` to UTC.
 
-def _parse_data(raw_data):
-    parsed_data = pydantic.parse_obj_as(list[EventDatum], raw_data)
-    return [dict(event) for event in parsed_data]
+    Dates which can't be parsed are returned as ``NaT``.
+    """
+    try:
+        # NumPy parses the local date time far faster than pandas parses the
+        # offset-aware string. Since there are only few distinct offsets,
+        # they can be parsed separately.
+        local = np.array(
+            [date_string[:19] for date_string in date_strings], dtype="datetime64[s]"
+        )
+        offsets = {
+            suffix: _utc_offset_minutes(suffix)
+            for suffix in {date_string[19:] for date_string in date_strings}
+        }
+        offset_minutes = np.array(
+            [offsets[date_string[19:]] for date_string in date_strings]
+        )
+    except (TypeError, ValueError):
+        return pd.to_datetime(
+            date_strings, format=_DATE_FORMAT, utc=True, errors="coerce"
+        ).dt.as_unit("us")
+    utc = local - offset_minutes.astype("timedelta64[m]")
+    return pd.Series(utc.astype("datetime64[us]")).dt.tz_localize("UTC")
+
+
+def _events_to_frame(events) -> pd.DataFrame:
+    """Extract the relevant columns of events and validate them all at once."""
+    events = list(events)
+    if len(events) == 0:
+        return pd.DataFrame()
+
+    date_strings = pd.Series(
+        [event.get("start", {}).get("dateTime") for event in events], dtype=object
+    )
+    descriptions = pd.Series(
+        [event.get("description") for event in events], dtype=object
+    )
+    titles = pd.Series([event.get("summary", "") for event in events], dtype=str)
 
+    dates = _parse_dates(date_strings)
+    distance_strings = descriptions.str.extract(
+        _DISTANCE_PATTERN, flags=re.DOTALL, expand=False
+    )
+    distances = pd.to_numeric(distance_strings, errors="coerce")
+    titles = titles.str.lower()
 
-def prune_events(events):
-    """Prune event rows as to only include certain columns."""
-    raw_data = [
+    errors = pd.DataFrame(
         {
-            "date_string": event["start"]["dateTime"],
-            "distance": (
-                event["description"].split("km")[0]
-                if "description" in event and "km" in event["description"]
-                else None
-            ),
-            "title": event["summary"].lower(),
+            "invalid date": dates.isna(),
+            "invalid distance": distance_strings.notna()
+            & ~distances.between(_MIN_DISTANCE, _MAX_DISTANCE),
+            "invalid sport": ~titles.isin(_SPORT_VALUES),
         }
-        for event in events
-    ]
-    return _parse_data(raw_data)
+    )
+    if (is_invalid := errors.any(axis="columns")).any():
+        details = [
+            f"{row}: {', '.join(errors.columns[errors.loc[row]])} "
+            f"({date_strings[row]!r}, {titles[row]!r}, {descriptions[row]!r})"
+            for row in errors.index[is_invalid]
+        ]
+        raise ValueError(
+            f"Encountered {is_invalid.sum()} invalid events:\n" + "\n".join(details)
+        )
+
+    return pd.DataFrame(
+        {"date_string": dates, "distance": distances.astype(float), "title": titles}
+    )
+
+
+def prune_events(events):
+    """Prune event rows as to only include certain columns."""
+    return _events_to_frame(events).to_dict(orient="records")
 
 
 def get_filtered_events(
@@ -174,218 +438,216 @@ def get_filtered_events(
     return list(filter(filter_function, events))
 
 
-def distance_weekly_vs_year(df, sport: utils.Sport, quantile_threshold=0.6):
-    # TODO: Fill up weeks with 0 distance in sport.
-    current_date = _current_date(df)
-    current_week = _current_week(df)
-    current_year = _current_year(df)
+@dataclass(frozen=True)
+class AggregationCube:
+    """Dense distance and count totals of a sport per day, ISO week, month and year.
 
-    weekly = df[(df["year"] == current_year) & (df["week"] == current_week)][
-        "distance"
-    ].sum()
+    Periods without any event are filled with zeros. ``last_event`` holds the
+    totals of the most recent event(s), i.e. of the 'current' date.
+    """
 
-    reference_value = (
-        df[
-            (df.index >= current_date - pd.Timedelta(days=365))
-            & ((df["week"] < current_week) | (df["year"] < current_year))
-        ]
-        .groupby("week")["distance"]
-        .sum()
-        .quantile(quantile_threshold)
-    )
+    daily: pd.DataFrame
+    weekly: pd.DataFrame
+    monthly: pd.DataFrame
+    yearly: pd.DataFrame
+    last_event: pd.Series
 
-    if weekly > reference_value:
-        return f"Weekly average {sport.value} volume was considerably higher than usual in past 12 months!"
+    @property
+    def current_day(self) -> pd.Period:
+        return self.daily.index[-1]
 
+    @property
+    def current_week(self) -> pd.Period:
+        return self.current_day.asfreq("W-SUN")
 
-def frequency_weekly_vs_year(df, sport: utils.Sport, quantile_threshold=0.6):
-    # TODO: Fill up weeks with 0 distance in sport.
-    current_date = _current_date(df)
-    current_week = _current_week(df)
-    current_year = _current_year(df)
+    @property
+    def current_month(self) -> pd.Period:
+        return self.current_day.asfreq("M")
 
-    weekly = df[(df["year"] == current_year) & (df["week"] == current_week)][
-        "date_string"
-    ].count()
+    @property
+    def current_year(self) -> pd.Period:
+        return self.current_day.asfreq("Y")
 
-    reference_value = (
-        df[
-            (df.index >= current_date - pd.Timedelta(days=365))
-            & ((df["week"] < current_week) | (df["year"] < current_year))
-        ]
-        .groupby("week")["date_string"]
-        .count()
-        .quantile(quantile_threshold)
-    )
-
-    if weekly > reference_value:
-        return f"Weekly number of {sport.value} activities was considerably higher than usual in past 12 months!"
+    def total(self, period: pd.Period, column: str = "distance") -> float:
+        frame = {
+            "D": self.daily,
+            "W": self.weekly,
+            "M": self.monthly,
+            "Y": self.yearly,
+        }[period.freqstr[0]]
+        return frame[column].get(period, 0)
 
+    def total_before_last_event(self, period: pd.Period, column: str = "distance"):
+        return self.total(period, column) - self.last_event[column]
 
-def distance_weekly_vs_ytd(df, sport: utils.Sport, quantile_threshold=0.6):
-    # TODO: Fill up weeks with 0 distance in sport.
-    current_week = _current_week(df)
-    current_year = _current_year(df)
+    def weeks(self, first: pd.Period, last: pd.Period) -> pd.DataFrame:
+        """Totals of all weeks from ``first`` to ``last``, both included."""
+        return self.weekly.loc[first:last]
 
-    weekly = df[(df["year"] == current_year) & (df["week"] == current_week)][
-        "distance"
-    ].sum()
 
-    reference_value = (
-        df[(df["year"] == current_year) & (df["week"] < current_week)]
-        .groupby("week")["distance"]
-        .sum()
-        .quantile(quantile_threshold)
+def get_cube(df: pd.DataFrame) -> AggregationCube:
+    """Aggregate the events of a sport in a single pass."""
+    days = df.index.tz_convert(None).to_period("D")
+    values = pd.DataFrame(
+        {"distance": df["distance"].fillna(0).to_numpy(), "count": 1}, index=days
+    )
+    daily = values.groupby(level=0).sum()
+    daily = daily.reindex(
+        pd.period_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0
+    )
+    return AggregationCube(
+        daily=daily,
+        weekly=daily.groupby(daily.index.asfreq("W-SUN")).sum(),
+        monthly=daily.groupby(daily.index.asfreq("M")).sum(),
+        yearly=daily.groupby(daily.index.asfreq("Y")).sum(),
+        # There could be several events on the most recent date, hence the sum.
+        last_event=values[df.index == df.index.max()].sum(),
     )
 
-    if weekly > reference_value:
-        return f"Weekly average {sport.value} volume was considerably higher than usual in {current_year}!"
 
+def _first_week_of_iso_year(week: pd.Period) -> pd.Period:
+    # The ISO year of a week is the year of its Thursday and the first
+    # ISO week of a year always contains the 4th of January.
+    iso_year = (week.start_time + pd.Timedelta(days=3)).year
+    return pd.Period(f"{iso_year}-01-04", freq="W-SUN")
 
-def frequency_weekly_vs_ytd(df, sport: utils.Sport, quantile_threshold=0.6):
-    # TODO: Fill up weeks with 0 distance in sport.
-    current_week = _current_week(df)
-    current_year = _current_year(df)
 
-    weekly = df[(df["year"] == current_year) & (df["week"] == current_week)][
-        "date_string"
-    ].count()
+def _weekly_vs_year(cube, column, quantile_threshold):
+    # The past 12 months.
+    reference_weeks = cube.weeks(cube.current_week - 52, cube.current_week - 1)
+    reference_value = reference_weeks[column].quantile(quantile_threshold)
+    return cube.total(cube.current_week, column) > reference_value
 
-    reference_value = (
-        df[(df["year"] == current_year) & (df["week"] < current_week)]
-        .groupby("week")["date_string"]
-        .count()
-        .quantile(quantile_threshold)
+
+def _weekly_vs_ytd(cube, column, quantile_threshold):
+    reference_weeks = cube.weeks(
+        _first_week_of_iso_year(cube.current_week), cube.current_week - 1
     )
+    reference_value = reference_weeks[column].quantile(quantile_threshold)
+    return cube.total(cube.current_week, column) > reference_value
 
-    if weekly > reference_value:
-        return f"Weekly number of {sport.value} activities was considerably higher than usual in past 12 months!"
 
+def distance_weekly_vs_year(
+    context: EvaluationContext, sport: utils.Sport, quantile_threshold=0.6
+):
+    if _weekly_vs_year(context.cube, "distance", quantile_threshold):
+        return f"Weekly average {sport.value} volume was considerably higher than usual in past 12 months!"
 
-def distance_mod_interval(df, sport: utils.Sport, interval=100):
-    date_last_event = _current_date(df)
-    current_year = _current_year(df)
 
-    yearly_distance_before_last_event = df[
-        (df["year"] == current_year) & (df.index < date_last_event)
-    ]["distance"].sum()
-    yearly_distance_after_last_event = (
-        yearly_distance_before_last_event + _distance_last_event(df)
-    )
-    if (
-        threshold := (yearly_distance_after_last_event // interval) * interval
-    ) > yearly_distance_before_last_event:
-        return f"You just crossed {int(threshold)}km in {sport.value}. Congrats!"
+def frequency_weekly_vs_year(
+    context: EvaluationContext, sport: utils.Sport, quantile_threshold=0.6
+):
+    if _weekly_vs_year(context.cube, "count", quantile_threshold):
+        return f"Weekly number of {sport.value} activities was considerably higher than usual in past 12 months!"
 
 
-def distance_previous_years_month(df, sport: utils.Sport):
-    date_last_event = _current_date(df)
-    current_month = _current_month(df)
-    current_year = _current_year(df)
-    previous_year = current_year - 1
+def distance_weekly_vs_ytd(
+    context: EvaluationContext, sport: utils.Sport, quantile_threshold=0.6
+):
+    if _weekly_vs_ytd(context.cube, "distance", quantile_threshold):
+        return f"Weekly average {sport.value} volume was considerably higher than usual in {context.current_year}!"
 
-    monthly_distance_previous_year = df[
-        (df["year"] == previous_year) & (df["month"] == current_month)
-    ]["distance"].sum()
 
-    monthly_distance_this_year_before_last_event = df[
-        (df["year"] == current_year)
-        & (df["month"] == current_month)
-        & (df.index < date_last_event)
-    ]["distance"].sum()
+def frequency_weekly_vs_ytd(
+    context: EvaluationContext, sport: utils.Sport, quantile_threshold=0.6
+):
+    if _weekly_vs_ytd(context.cube, "count", quantile_threshold):
+        return f"Weekly number of {sport.value} activities was considerably higher than usual in past 12 months!"
 
-    monthly_distance_this_year_after_last_event = (
-        monthly_distance_this_year_before_last_event + _distance_last_event(df)
-    )
 
+def distance_mod_interval(context: EvaluationContext, sport: utils.Sport, interval=100):
+    cube = context.cube
+    yearly_distance_before_last_event = cube.total_before_last_event(cube.current_year)
+    yearly_distance_after_last_event = cube.total(cube.current_year)
     if (
-        monthly_distance_this_year_before_last_event < monthly_distance_previous_year
-    ) and (
-        monthly_distance_this_year_after_last_event >= monthly_distance_previous_year
-    ):
-        return f"You just topped the distance of the same month of last year in {sport.value}!"
+        threshold := (yearly_distance_after_last_event // interval) * interval
+    ) > yearly_distance_before_last_event:
+        return f"You just crossed {int(threshold)}km in {sport.value}. Congrats!"
 
 
-def frequency_previous_years_month(df, sport: utils.Sport):
-    date_last_event = _current_date(df)
-    current_month = _current_month(df)
-    current_year = _current_year(df)
-    previous_year = current_year - 1
+def _tops_previous(cube, current_period, previous_period, column):
+    """Whether the most recent event made the current period top the previous one."""
+    previous = cube.total(previous_period, column)
+    before_last_event = cube.total_before_last_event(current_period, column)
+    # Several events on the most recent date are counted as a single one.
+    after_last_event = (
+        before_last_event + 1
+        if column == "count"
+        else cube.total(current_period, column)
+    )
+    return before_last_event < previous and after_last_event >= previous
 
-    monthly_frequency_previous_year = df[
-        (df["year"] == previous_year) & (df["month"] == current_month)
-    ]["date_string"].count()
 
-    monthly_frequency_this_year_before_last_event = df[
-        (df["year"] == current_year)
-        & (df["month"] == current_month)
-        & (df.index < date_last_event)
-    ]["date_string"].count()
+def distance_previous_years_month(context: EvaluationContext, sport: utils.Sport):
+    cube = context.cube
+    if _tops_previous(cube, cube.current_month, cube.current_month - 12, "distance"):
+        return f"You just topped the distance of the same month of last year in {sport.value}!"
 
-    monthly_frequency_this_year_after_last_event = (
-        monthly_frequency_this_year_before_last_event + 1
-    )
 
-    if (
-        monthly_frequency_this_year_before_last_event < monthly_frequency_previous_year
-    ) and (
-        monthly_frequency_this_year_after_last_event >= monthly_frequency_previous_year
-    ):
+def frequency_previous_years_month(context: EvaluationContext, sport: utils.Sport):
+    cube = context.cube
+    if _tops_previous(cube, cube.current_month, cube.current_month - 12, "count"):
         return f"You just topped the number of {sport.value} activities of the same month of last year. Strong."
 
 
-def distance_previous_year(df, sport: utils.Sport):
-    date_last_event = _current_date(df)
-    current_year = _current_year(df)
-    previous_year = current_year - 1
-
-    yearly_distance_previous_year = df[df["year"] == previous_year]["distance"].sum()
-    yearly_distance_this_year_before_last_event = df[
-        (df["year"] == current_year) & (df.index < date_last_event)
-    ]["distance"].sum()
-    yearly_distance_this_year_after_last_event = (
-        yearly_distance_this_year_before_last_event + _distance_last_event(df)
-    )
-    if (
-        yearly_distance_this_year_before_last_event < yearly_distance_previous_year
-    ) and (yearly_distance_this_year_after_last_event >= yearly_distance_previous_year):
+def distance_previous_year(context: EvaluationContext, sport: utils.Sport):
+    cube = context.cube
+    if _tops_previous(cube, cube.current_year, cube.current_year - 1, "distance"):
         return f"You just surpassed the {sport.value} distance of the last year! Mad!"
 
 
-def frequency_previous_year(df, sport: utils.Sport):
-    date_last_event = _current_date(df)
-    current_year = _current_year(df)
-    previous_year = current_year - 1
+def frequency_previous_year(context: EvaluationContext, sport: utils.Sport):
+    cube = context.cube
+    if _tops_previous(cube, cube.current_year, cube.current_year - 1, "count"):
+        return f"You just suprassed the number of {sport.value} activities of last year! Sick!"
+
 
-    yearly_frequency_previous_year = df[df["year"] == previous_year][
-        "date_string"
-    ].count()
-    yearly_frequency_this_year_before_last_event = df[
-        (df["year"] == current_year) & (df.index < date_last_event)
-    ]["date_string"].count()
-    yearly_frequency_this_year_after_last_event = (
-        yearly_frequency_this_year_before_last_event + 1
+@dataclass(frozen=True)
+class Streaks:
+    """Lengths of runs of consecutive days with at least one activity.
+
+    Runs spanning New Year's Eve count towards the year in which they end.
+    """
+
+    current: int
+    longest: int
+    longest_before_current: int
+    yearly_longest: dict[int, int]
+
+
+def get_streaks(days: np.ndarray) -> Streaks:
+    """Find all streaks in a single pass over sorted, unique ``datetime64[D]`` days."""
+    ordinals = days.astype(int)
+    # A new streak starts wherever the gap to the previous active day isn't one day.
+    starts = np.flatnonzero(np.diff(ordinals, prepend=ordinals[0] - 2) != 1)
+    lengths = np.diff(np.append(starts, len(ordinals)))
+    end_years = days[starts + lengths - 1].astype("datetime64[Y]").astype(int) + 1970
+    return Streaks(
+        current=int(lengths[-1]),
+        longest=int(lengths.max()),
+        longest_before_current=int(lengths[:-1].max(initial=0)),
+        yearly_longest={
+            int(year): int(length)
+            for year, length in pd.Series(lengths).groupby(end_years).max().items()
+        },
     )
-    if (
-        yearly_frequency_this_year_before_last_event < yearly_frequency_previous_year
-    ) and (
-        yearly_frequency_this_year_after_last_event >= yearly_frequency_previous_year
-    ):
-        return f"You just suprassed the number of {sport.value} activities of last year! Sick!"
 
 
-def streak(df, sport: utils.Sport, minimal_duration=3):
-    date_last_event = _current_date(df).date()
-    has_streak = True
-    dates = df.index.date
-    n_consecutive_days = 1
-    while date_last_event - datetime.timedelta(days=n_consecutive_days) in dates:
-        n_consecutive_days += 1
+def streak(context: EvaluationContext, sport: utils.Sport, minimal_duration=3):
+    n_consecutive_days = context.streaks.current
     has_streak = n_consecutive_days >= minimal_duration
     if has_streak:
         return f"Wow! A streak of {n_consecutive_days} {sport.value} activities!"
 
 
+def streak_record(context: EvaluationContext, sport: utils.Sport, minimal_duration=3):
+    streaks = context.streaks
+    # Only notify on the first day on which the streak is both long enough
+    # and longer than any earlier one.
+    if streaks.current == max(minimal_duration, streaks.longest_before_current + 1):
+        return f"New record! Never before did you have a streak of {streaks.current} {sport.value} activities."
+
+
 def _get_cumulative_day_distances(df_year: pd.DataFrame) -> pd.DataFrame:
     df = df_year.copy()
     df = (
@@ -399,44 +661,47 @@ def _get_cumulative_day_distances(df_year: pd.DataFrame) -> pd.DataFrame:
 
 
 def plot_cumulative_day_distances(
-    df, sport: utils.Sport, path: Path, n_years=2, baselines=[]
-):
-    fig, ax = plt.subplots()
-
-    current_year = _current_year(df)
+    context: EvaluationContext,
+    sport: utils.Sport,
+    n_years=2,
+    baselines=[],
+    dpi=images.DPI,
+    figsize=images.FIGSIZE,
+) -> io.BytesIO:
+    current_year = context.current_year
     df_cums = {
-        year: _get_cumulative_day_distances(df[df["year"] == year])
+        year: _get_cumulative_day_distances(context.in_year(year))
         for year in range(current_year, current_year - n_years - 1, -1)
     }
 
-    for year, df_cum in df_cums.items():
-        df_cum.plot(
-            x="day_of_year",
-            y="distance",
-            ax=ax,
-            label=str(year),
-            drawstyle="steps-post",
-        )
+    with images.figure(figsize=figsize) as fig:
+        ax = fig.subplots()
 
-    for baseline in baselines:
-        x = list(range(365))
-        y = [day_of_year * baseline / 365 for day_of_year in x]
-        ax.plot(x, y, label=f"{baseline} km")
+        for year, df_cum in df_cums.items():
+            ax.plot(
+                df_cum["day_of_year"],
+                df_cum["distance"],
+                label=str(year),
+                drawstyle="steps-post",
+            )
 
-    ax.legend()
-    x_max = df_cums[current_year]["day_of_year"].max()
-    y_max = max(
-        df_cums[year][df_cums[year]["day_of_year"] <= x_max]["distance"].max()
-        for year in range(current_year, current_year - n_years - 1, -1)
-    )
-    ax.set_xlim(1, x_max)
-    ax.set_ylim(0, y_max)
-    ax.set_ylabel(f"cumulative distance in {sport.value} [km]")
+        for baseline in baselines:
+            x = list(range(365))
+            y = [day_of_year * baseline / 365 for day_of_year in x]
+            ax.plot(x, y, label=f"{baseline} km")
 
-    image_path = path / f"cumulative_{sport.value}.png"
-    fig.savefig(image_path)
-    fig.show()
-    return image_path
+        ax.legend()
+        x_max = df_cums[current_year]["day_of_year"].max()
+        y_max = max(
+            df_cums[year][df_cums[year]["day_of_year"] <= x_max]["distance"].max()
+            for year in range(current_year, current_year - n_years - 1, -1)
+        )
+        ax.set_xlim(1, x_max)
+        ax.set_ylim(0, y_max)
+        ax.set_xlabel("day_of_year")
+        ax.set_ylabel(f"cumulative distance in {sport.value} [km]")
+
+        return images.to_png(fig, name=f"cumulative_{sport.value}.png", dpi=dpi)
 
 
 def message_function_registry(sport: utils.Sport, interval: utils.TriggerInterval):
@@ -448,6 +713,7 @@ def message_function_registry(sport: utils.Sport, interval: utils.TriggerInterva
             partial(frequency_previous_year, sport=sport),
             partial(frequency_previous_years_month, sport=sport),
             partial(streak, sport=sport),
+            partial(streak_record, sport=sport),
         ]
     if sport == utils.Sport.running and interval == utils.TriggerInterval.weekly:
         return [
@@ -464,6 +730,7 @@ def message_function_registry(sport: utils.Sport, interval: utils.TriggerInterva
             partial(frequency_previous_year, sport=sport),
             partial(frequency_previous_years_month, sport=sport),
             partial(streak, sport=sport),
+            partial(streak_record, sport=sport),
         ]
     if sport == utils.Sport.cycling and interval == utils.TriggerInterval.weekly:
         return [
@@ -475,6 +742,7 @@ def message_function_registry(sport: utils.Sport, interval: utils.TriggerInterva
             partial(frequency_previous_year, sport=sport),
             partial(frequency_previous_years_month, sport=sport),
             partial(streak, sport=sport),
+            partial(streak_record, sport=sport),
         ]
     if sport == utils.Sport.gym and interval == utils.TriggerInterval.weekly:
         return [
@@ -482,32 +750,41 @@ def message_function_registry(sport: utils.Sport, interval: utils.TriggerInterva
             partial(frequency_weekly_vs_ytd, sport=sport),
         ]
     if sport == utils.Sport.swimming and interval == utils.TriggerInterval.daily:
-        return [partial(streak, sport=sport, duration=2)]
+        return [partial(streak, sport=sport, minimal_duration=2)]
     if sport == utils.Sport.swimming and interval == utils.TriggerInterval.weekly:
         return []
     return []
 
 
 def image_function_registry(
-    sport: utils.Sport, interval: utils.TriggerInterval, path: Path
+    sport: utils.Sport, interval: utils.TriggerInterval, **plot_kwargs
 ):
+    """Obtain the image functions of a sport.
+
+    ``plot_kwargs``, such as ``dpi`` and ``figsize``, are passed on to all of them.
+    """
     if sport == utils.Sport.running and interval == utils.TriggerInterval.weekly:
         return [
             partial(
                 plot_cumulative_day_distances,
                 sport=sport,
-                path=path,
                 baselines=[1400, 1600],
+                **plot_kwargs,
             )
         ]
     if sport == utils.Sport.cycling and interval == utils.TriggerInterval.weekly:
         return [
             partial(
-                plot_cumulative_day_distances, sport=sport, path=path, baselines=[2000]
+                plot_cumulative_day_distances,
+                sport=sport,
+                baselines=[2000],
+                **plot_kwargs,
             )
         ]
     if sport == utils.Sport.swimming and interval == utils.TriggerInterval.weekly:
         return [
-            partial(plot_cumulative_day_distances, sport=sport, path=path, n_years=1)
+            partial(
+                plot_cumulative_day_distances, sport=sport, n_years=1, **plot_kwargs
+            )
         ]
     return []
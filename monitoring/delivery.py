@@ -0,0 +1,124 @@
+import asyncio
+import datetime
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from telegram.error import RetryAfter
+
+from . import tracing
+
+_MESSAGE = "message"
+_PHOTO = "photo"
+
+
+@dataclass
+class Outbox:
+    """Messages and photos to be sent, in order."""
+
+    items: list[tuple[str, object]] = field(default_factory=list)
+
+    def add_messages(self, messages):
+        self.items += [(_MESSAGE, message) for message in messages]
+
+    def add_photos(self, photos):
+        self.items += [(_PHOTO, photo) for photo in photos]
+
+
+class _ChatRateLimiter:
+    """Space out the start of requests to a single chat.
+
+    Telegram asks bots not to send more than about one message per second to
+    the same chat. Waiting callers are served in order.
+    """
+
+    def __init__(self, messages_per_second: float):
+        self.interval = 1 / messages_per_second
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+
+    async def wait(self):
+        async with self.lock:
+            delay = self.next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.next_start = time.monotonic() + self.interval
+
+
+def _seconds(retry_after) -> float:
+    if isinstance(retry_after, datetime.timedelta):
+        return retry_after.total_seconds()
+    return retry_after
+
+
+async def _send_item(bot, chat_id, kind, payload):
+    tracing.count("telegram_requests")
+    if kind == _MESSAGE:
+        return await bot.send_message(chat_id=chat_id, text=payload)
+    if isinstance(payload, (str, Path)):
+        with open(payload, "rb") as photo:
+            return await bot.send_photo(chat_id=chat_id, photo=photo)
+    # In-memory files might have been read by a previous attempt.
+    payload.seek(0)
+    return await bot.send_photo(chat_id=chat_id, photo=payload)
+
+
+async def _send_with_retries(
+    bot, chat_id, kind, payload, semaphore, rate_limiter, max_retries
+):
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            await rate_limiter.wait()
+            try:
+                return await _send_item(bot, chat_id, kind, payload)
+            except RetryAfter as error:
+                if attempt == max_retries:
+                    raise
+                retry_after = _seconds(error.retry_after)
+                tracing.log(
+                    f"Rate limited by Telegram, retrying in {retry_after}s.",
+                    severity="WARNING",
+                    retry_after_s=retry_after,
+                )
+                await asyncio.sleep(retry_after)
+
+
+async def _send_outbox(
+    bot, chat_id, outbox, max_concurrency, messages_per_second, max_retries
+):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    rate_limiter = _ChatRateLimiter(messages_per_second)
+    # A single session, and thereby connection pool, is used for all requests.
+    async with bot:
+        await asyncio.gather(
+            *(
+                _send_with_retries(
+                    bot, chat_id, kind, payload, semaphore, rate_limiter, max_retries
+                )
+                for kind, payload in outbox.items
+            )
+        )
+
+
+def send(
+    bot,
+    chat_id,
+    outbox: Outbox,
+    max_concurrency: int = 4,
+    messages_per_second: float = 1,
+    max_retries: int = 3,
+):
+    """Send all items of an outbox within a single event loop and bot session.
+
+    At most ``max_concurrency`` requests are in flight at once. Requests are
+    started in the order of the outbox and no faster than
+    ``messages_per_second``. Requests which are rate-limited by Telegram are
+    retried after the requested waiting time.
+    """
+    if len(outbox.items) == 0:
+        return
+    asyncio.run(
+        _send_outbox(
+            bot, chat_id, outbox, max_concurrency, messages_per_second, max_retries
+        )
+    )
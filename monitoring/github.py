@@ -0,0 +1,105 @@
+"""Mirror a directory of a GitHub repository, downloading only changed files."""
+
+import hashlib
+from pathlib import Path
+
+from . import tracing
+
+_API = "https://api.github.com"
+_COMMIT_FILE = ".commit"
+
+
+def _git_blob_sha(content: bytes) -> str:
+    """Compute the SHA git assigns to a file with the given content."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def _get(session, url, headers, accept="application/vnd.github+json"):
+    response = session.get(url, headers=headers | {"Accept": accept})
+    response.raise_for_status()
+    tracing.count("github_api_calls")
+    tracing.count("bytes_downloaded", len(response.content))
+    return response
+
+
+def resolve_ref(session, repo_url: str, ref: str, headers: dict) -> str:
+    """Resolve a branch, tag or commit to the SHA of the commit."""
+    return _get(
+        session, f"{repo_url}/commits/{ref}", headers, "application/vnd.github.sha"
+    ).text.strip()
+
+
+def _get_subtree(session, repo_url, commit_sha, directory, headers) -> list[dict]:
+    tree = _get(session, f"{repo_url}/git/trees/{commit_sha}", headers).json()
+    for part in Path(directory).parts:
+        entry = next(
+            (
+                entry
+                for entry in tree["tree"]
+                if entry["path"] == part and entry["type"] == "tree"
+            ),
+            None,
+        )
+        if entry is None:
+            raise FileNotFoundError(
+                f"Directory {directory} not found in {repo_url} at {commit_sha}."
+            )
+        tree = _get(session, f"{repo_url}/git/trees/{entry['sha']}", headers).json()
+    return [entry for entry in tree["tree"] if entry["type"] == "blob"]
+
+
+def sync_directory(
+    session,
+    owner: str,
+    repo: str,
+    ref: str,
+    directory: str,
+    target: Path,
+    headers: dict,
+    suffix: str = ".org",
+) -> Path:
+    """Mirror the files of ``directory`` at ``ref`` into ``target``.
+
+    If ``ref`` still points to the commit mirrored last time, nothing but the
+    commit SHA is requested. Otherwise, the tree of ``directory`` is listed
+    and only files whose content differs from the local copy are downloaded.
+    """
+    repo_url = f"{_API}/repos/{owner}/{repo}"
+    target.mkdir(parents=True, exist_ok=True)
+    commit_file = target / _COMMIT_FILE
+
+    commit_sha = resolve_ref(session, repo_url, ref, headers)
+    if commit_file.exists() and commit_file.read_text() == commit_sha:
+        tracing.log(f"Org files are up to date with {commit_sha}.", commit=commit_sha)
+        return target
+
+    blobs = {
+        entry["path"]: entry["sha"]
+        for entry in _get_subtree(session, repo_url, commit_sha, directory, headers)
+        if entry["path"].endswith(suffix)
+    }
+    n_downloads = 0
+    for path, blob_sha in blobs.items():
+        local_path = target / path
+        if local_path.exists() and _git_blob_sha(local_path.read_bytes()) == blob_sha:
+            continue
+        content = _get(
+            session,
+            f"{repo_url}/git/blobs/{blob_sha}",
+            headers,
+            "application/vnd.github.raw",
+        ).content
+        local_path.write_bytes(content)
+        n_downloads += 1
+    for local_path in target.glob(f"*{suffix}"):
+        if local_path.name not in blobs:
+            local_path.unlink()
+
+    commit_file.write_text(commit_sha)
+    tracing.log(
+        f"Downloaded {n_downloads} of {len(blobs)} org files at {commit_sha}.",
+        commit=commit_sha,
+        n_downloads=n_downloads,
+        n_files=len(blobs),
+    )
+    return target
@@ -0,0 +1,33 @@
+import io
+from contextlib import contextmanager
+
+# Telegram compresses photos anyway, larger images only cost upload time.
+DPI = 100
+FIGSIZE = (6.4, 4.8)
+
+
+@contextmanager
+def figure(figsize=FIGSIZE):
+    """Create a figure which is neither managed by pyplot nor shown.
+
+    Such figures are rendered by the non-interactive Agg backend and are
+    released once the context is left.
+    """
+    # matplotlib is only imported once a figure is actually needed.
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    try:
+        yield fig
+    finally:
+        fig.clear()
+
+
+def to_png(fig, name: str, dpi: int = DPI) -> io.BytesIO:
+    """Render a figure into an in-memory PNG file."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    buffer.seek(0)
+    # Used as file name when uploading.
+    buffer.name = name
+    return buffer
@@ -1,14 +1,19 @@
 import datetime
-import operator
+import io
+import re
+import warnings
+from concurrent.futures import Executor
+from functools import partial
 from math import ceil
 from pathlib import Path
-from typing import Union
+from typing import Iterable, Optional, Union
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import pydantic
-from orgparse import load
+from orgparse import loads
+
+from . import images, stats, tracing
 
 WEEK_ROOT = Path("/Users/kevin/org/weeks")
 PROPERTIES = [
@@ -22,6 +27,33 @@ PROPERTIES = [
 ]
 # Property of the underlying org file format.
 _FIRST_WEEKDAY_INDEX = 3
+_MISSING = "x"
+# The pattern orgparse uses for headings, r"^\*+ ", preceded by a line break.
+_HEADING_PATTERN = re.compile(r"\n(\*+) ")
+# orgparse's pattern for properties, r"^\s*:(.*?):\s*(.*?)\s*$", applied to
+# each line of a multi-line string.
+_PROPERTY_PATTERN = re.compile(
+    r"^[^\S\n]*:([^:\n]*):[^\S\n]*(.*?)[^\S\n]*$", re.MULTILINE
+)
+# Line breaks recognized by ``str.splitlines`` apart from '\n'. Lone '\r' are
+# rare, for simplicity, '\r\n' is normalized, too.
+_LINE_BREAKS = "\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+_INT_VALUES = ["0", "1", "2", "3", "4", "5"]
+_FASTING_POSITION = PROPERTIES.index("Fasting")
+_SCORES = [column for column in PROPERTIES if column != "Fasting"]
+_INT_POSITIONS = [
+    position for position in range(len(PROPERTIES)) if position != _FASTING_POSITION
+]
+_FLOAT_PATTERN = re.compile(r"-?[0-9]+(?:\.[0-9]+)?")
+# Directories of week files are named after the last two digits of their year.
+_WEEK_DIR_PATTERN = re.compile(r"^(\d{2})-weeks$")
+
+_NOT_GREAT_THIS_WEEK = "Oh. {} was not so great this week."
+_SPLENDID_THIS_WEEK = "Jeez! {} was truly splendid this week."
+_NOT_GOOD_YESTERDAY = "Hmm. {} looked not good yesterday. What can be done?"
+_PROBLEMATIC_TWO_DAYS = (
+    "{} has looked problematic over the past two days. Take it easy pal."
+)
 
 
 def _this_week():
@@ -49,195 +81,488 @@ class DayData(pydantic.BaseModel):
     week: int
 
 
-def _validate_data(values: dict):
-    for key, value in values.items():
+def _validate_day_keys(values: dict):
+    for key in values:
         if not isinstance(key, int) or key < 0 or key > 366:
             raise ValueError(f"Encountered an unexpected day-key: {key}")
-        values[key] = dict(DayData(**value))
-    return values
+
+
+def _parse_week(content: str, week: int, first_weekday_index: int) -> list[dict]:
+    root = loads(content)
+    days = []
+    for offset in range(7):
+        properties = root.children[first_weekday_index + offset].properties
+        try:
+            days.append(dict(DayData(**properties, week=week)))
+        except pydantic.ValidationError as error:
+            # Unlike pydantic's error, a ValueError can be passed on by a
+            # process pool.
+            raise ValueError(
+                f"Invalid data in week {week}, day {offset + 1}: {error}"
+            ) from None
+    return days
+
+
+def _decode_week(array: np.ndarray, week: int) -> list[dict]:
+    columns = []
+    for column, values in zip(PROPERTIES, array.T.tolist()):
+        convert = float if column == "Fasting" else int
+        # Only nan differs from itself.
+        columns.append(
+            [_MISSING if value != value else convert(value) for value in values]
+        )
+    return [dict(zip(PROPERTIES, row), week=week) for row in zip(*columns)]
+
+
+def _load_week(path: Path, week: int, first_weekday_index: int) -> list[dict]:
+    """Parse and validate the days of a week file with orgparse."""
+    return _parse_week(path.read_bytes().decode(), week, first_weekday_index)
+
+
+def _parse_drawer(body: str) -> dict[str, str]:
+    """Parse the first property drawer within the lines below a heading."""
+    if (start := body.find(":PROPERTIES:")) == -1:
+        return {}
+    # The drawer starts with the line after ':PROPERTIES:' and ends with the
+    # first line containing ':END:', if any.
+    start = body.find("\n", start) + 1
+    if start == 0:
+        return {}
+    end = body.find(":END:", start)
+    end = len(body) if end == -1 else body.rfind("\n", start, end) + 1
+    return dict(_PROPERTY_PATTERN.findall(body, start, end))
+
+
+def _scan_week(content: str, first_weekday_index: int) -> list[dict[str, str]]:
+    """Find the property drawers of the day headings without building a tree.
+
+    Headings and drawers are recognized like orgparse does: the days are
+    top-level headings and only a heading's first drawer counts.
+    """
+    if any(line_break in content for line_break in _LINE_BREAKS):
+        content = "\n".join(content.splitlines())
+    # Prepending a line break allows to find all headings by the line break
+    # preceding them.
+    content = "\n" + content
+    headings = [
+        (match.start(), len(match.group(1)))
+        for match in _HEADING_PATTERN.finditer(content)
+    ]
+    # A heading is a top-level heading unless a previous heading has a lower
+    # level.
+    top_level = []
+    min_level = None
+    for index, (_, level) in enumerate(headings):
+        if min_level is None or level <= min_level:
+            min_level = level
+            top_level.append(index)
+
+    drawers = []
+    for index in top_level[first_weekday_index : first_weekday_index + 7]:
+        start = content.find("\n", headings[index][0] + 1)
+        end = headings[index + 1][0] if index + 1 < len(headings) else len(content)
+        drawers.append({} if start == -1 else _parse_drawer(content[start + 1 : end]))
+    return drawers
+
+
+def _read_week(path: Path, first_weekday_index: int) -> list[dict[str, str]]:
+    return _scan_week(path.read_bytes().decode(), first_weekday_index)
+
+
+def _validate_columns(raw: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Validate the properties of all days at once.
+
+    ``raw`` holds the property strings, one row per day and None where a
+    property is missing. Only the values in their usual form are covered:
+    'x', the digits 0 to 5 and plain decimal numbers for 'Fasting'. Returns the
+    values, 'x' becoming nan, and whether each day consists of such values
+    only.
+    """
+    values = np.full(raw.shape, np.nan)
+    is_valid = raw == _MISSING
+    ints = raw[:, _INT_POSITIONS]
+    int_values = np.full(ints.shape, np.nan)
+    for number, string in enumerate(_INT_VALUES):
+        int_values[ints == string] = number
+    values[:, _INT_POSITIONS] = int_values
+    is_valid[:, _INT_POSITIONS] |= ~np.isnan(int_values)
+
+    fasting = raw[:, _FASTING_POSITION]
+    is_number = np.array(
+        [
+            isinstance(string, str) and _FLOAT_PATTERN.fullmatch(string) is not None
+            for string in fasting
+        ],
+        dtype=bool,
+    )
+    numbers = fasting[is_number].astype(np.float64)
+    values[is_number, _FASTING_POSITION] = numbers
+    is_valid[is_number, _FASTING_POSITION] = numbers >= -1
+    return values, is_valid.all(axis=1)
+
+
+def _load_scanned_weeks(
+    weeks: range, scanned_weeks: Iterable[list[dict[str, str]]]
+) -> list[list[dict]]:
+    """Validate the scanned weeks column-wise."""
+    scanned_weeks = list(scanned_weeks)
+    for week, days in zip(weeks, scanned_weeks):
+        if len(days) < 7:
+            raise ValueError(f"Found fewer than seven days in week {week}.")
+    values, is_valid = _validate_columns(
+        np.array(
+            [
+                [day.get(column) for column in PROPERTIES]
+                for days in scanned_weeks
+                for day in days
+            ],
+            dtype=object,
+        ).reshape(-1, len(PROPERTIES))
+    )
+
+    days_per_week = []
+    for index, (week, days) in enumerate(zip(weeks, scanned_weeks)):
+        position = 7 * index
+        decoded = _decode_week(values[position : position + 7], week)
+        for offset in np.flatnonzero(~is_valid[position : position + 7]):
+            # Unusual and invalid values are left to pydantic.
+            try:
+                decoded[offset] = dict(DayData(**days[offset], week=week))
+            except pydantic.ValidationError as error:
+                raise ValueError(
+                    f"Invalid data in week {week}, day {offset + 1}: {error}"
+                ) from None
+        days_per_week.append(decoded)
+    return days_per_week
 
 
 def load_data(
     max_week: int = None,
     week_root: Path = WEEK_ROOT,
     first_weekday_index: int = _FIRST_WEEKDAY_INDEX,
+    executor: Optional[Executor] = None,
+    chunksize: int = 4,
+    engine: str = "scanner",
 ) -> pd.DataFrame:
+    """Load the days of the week files up to ``max_week``.
+
+    The default ``engine``, 'scanner', only scans the day headings and their
+    property drawers and validates all days at once. 'orgparse' parses full
+    trees and validates day by day; both yield the same data.
+
+    With an ``executor``, e.g. a ``ProcessPoolExecutor``, the week files are
+    parsed concurrently, ``chunksize`` weeks per task.
+    """
     values = {}
     if max_week is None:
         max_week = _this_week()
-    for week in range(1, max_week + 1):
-        root = load(week_root / f"{week}.org")
-        for child_index in range(first_weekday_index, first_weekday_index + 7):
-            day_values = root.children[child_index].properties
-            day_values.update({"week": week})
-            day = (week - 1) * 7 + (child_index - first_weekday_index)
-            values[day] = day_values
-    values = _validate_data(values)
-    df = pd.DataFrame(values)
-    return df.transpose()
+    weeks = range(1, max_week + 1)
+    paths = [week_root / f"{week}.org" for week in weeks]
+    if engine == "scanner":
+        function = partial(_read_week, first_weekday_index=first_weekday_index)
+        arguments = [paths]
+    elif engine == "orgparse":
+        function = partial(_load_week, first_weekday_index=first_weekday_index)
+        arguments = [paths, weeks]
+    else:
+        raise ValueError(f"Unexpected engine: {engine}.")
+    if executor is None:
+        results = map(function, *arguments)
+    else:
+        results = executor.map(function, *arguments, chunksize=chunksize)
+    # Both maps preserve the order of the weeks.
+    if engine == "scanner":
+        days_per_week = _load_scanned_weeks(weeks, results)
+    else:
+        days_per_week = results
+    for week, days in zip(weeks, days_per_week):
+        for offset, day_values in enumerate(days):
+            values[(week - 1) * 7 + offset] = day_values
+    _validate_day_keys(values)
+    # Column by column, such that each column gets its own dtype.
+    columns = next(iter(values.values()), {}).keys()
+    return pd.DataFrame(
+        {column: [day[column] for day in values.values()] for column in columns},
+        index=list(values),
+    )
 
 
 def process_data(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.replace("x", np.nan)
-    df = df.replace("-1", np.nan)
-    # Float allows for nans, int not.
-    df = df.astype(np.float16)
-    df = df.assign(week=df["week"].astype(int))
-    return df
+    """Convert the loaded values into compact columns with missing values.
 
+    Scores become 8-bit integer codes with a mask of missing values
+    (``UInt8``), all other values ``float32``.
+    """
+    columns = {}
+    for column in df.columns:
+        if column == "week":
+            columns[column] = df[column].astype(int)
+            continue
+        values = df[column].replace({_MISSING: np.nan, "-1": np.nan})
+        values = values.astype(np.float64)
+        columns[column] = values.astype("UInt8" if column in _SCORES else np.float32)
+    return pd.DataFrame(columns, index=df.index)
 
-def _df_this_week(df):
-    return df[df["week"] == _this_week()]
 
+def year_of_week_dir(week_dir: Path) -> int:
+    """The (ISO) year of the week files in a directory like '24-weeks'.
 
-def _df_last_week(df):
-    return df[df["week"] == _this_week() - 1]
+    Directories named differently are taken to hold the current year.
+    """
+    if (match := _WEEK_DIR_PATTERN.match(Path(week_dir).name)) is None:
+        return datetime.date.today().isocalendar().year
+    return 2000 + int(match.group(1))
 
 
-def _df_last_days(df, n_days):
-    # There is no straightforward mapping between the current date
-    # and the day index.
-    return df.dropna().tail(n_days)
+def with_dates(df: pd.DataFrame, year: int) -> pd.DataFrame:
+    """Index processed data by date rather than by the day within the year."""
+    # The first day of the org files is the Monday of the first ISO week.
+    first_day = pd.Timestamp(datetime.date.fromisocalendar(year, 1, 1))
+    dates = first_day + pd.to_timedelta(df.index.astype(int), unit="D")
+    return df.set_axis(pd.DatetimeIndex(dates, name="date"))
 
 
-def _non_corrected_sd(values):
-    """Estimate the non-corrected empirical standard deviation."""
-    if values is None or len(values) == 0:
-        return 0
-    mean = sum(values) / len(values)
-    var = sum((value - mean) ** 2 for value in values) / len(values)
-    return np.sqrt(var)
+def _df_this_week(df):
+    return df[df["week"] == _this_week()]
 
 
-def _get_operator(is_negative, is_inverted):
-    """Obtain the appropriate operator for a monitoring comparison.
+def _df_last_week(df):
+    return df[df["week"] == _this_week() - 1]
+
+
+def _get_operators(is_negative, is_inverted: np.ndarray, values, thresholds):
+    """Compare ``values`` with the ``thresholds`` of a monitoring condition.
 
     If ``is_negative``, the comparison attempts to assess whether a 'negative'
     condition is satisfied. An example of that would be to have slept badly.
-    If ``is_inverted``, the values to be assess are interpreted as better when
-    smaller in value.
+    ``is_inverted`` holds, per column, whether its values are interpreted as
+    better when smaller in value.
     """
-    if is_negative != is_inverted:
-        return operator.le
-    return operator.ge
+    return np.where(
+        is_negative != is_inverted, values <= thresholds, values >= thresholds
+    )
 
 
-def _get_threshold(is_negative, is_inverted, mean, deviation):
-    """Obtain the appropriate threshold for a monitoring comparison.
-
-    If ``is_negative``, the comparison attempts to assess whether a 'negative'
-    condition is satisfied. An example of that would be to have slept badly.
-    If ``is_inverted``, the values to be assess are interpreted as better when
-    smaller in value.
+def _get_thresholds(is_negative, is_inverted: np.ndarray, means, deviations):
+    """Obtain the thresholds of a monitoring condition for all columns at once.
 
     If either ``is_negative`` or ``is_inverted``, we define a lower bound.
     Otherwise, we define an upper bound.
     """
-    return mean + (-1) ** (is_negative + is_inverted) * deviation
+    return means + np.where(is_negative != is_inverted, -1, 1) * deviations
 
 
-def _has_daily_message(values, sigma, mean, n_days, is_negative, is_inverted):
-    op = _get_operator(is_negative, is_inverted)
-    if n_days == 1:
-        deviation = 2 * sigma
-    elif n_days == 2:
-        deviation = sigma
-    else:
-        raise ValueError(f"Unexpected number of days: {n_days}.")
-    threshold = _get_threshold(is_negative, is_inverted, mean, deviation)
-    return op(values, threshold).all()
+def _is_inverted(columns: list[str]) -> np.ndarray:
+    return np.array([column == "Stress" for column in columns])
 
 
-def _has_weekly_message(global_values, local_mean, quantile, is_negative, is_inverted):
-    threshold = global_values.quantile(q=quantile)
-    op = _get_operator(is_negative, is_inverted)
-    return op(local_mean, threshold)
+def _weekly_messages(
+    columns: list[str], local_means, lower_thresholds, upper_thresholds
+) -> list[tuple[str, str]]:
+    """Pairs of column and message for the weekly ``local_means``."""
+    is_inverted = _is_inverted(columns)
+    is_not_great = _get_operators(True, is_inverted, local_means, lower_thresholds)
+    is_splendid = _get_operators(False, is_inverted, local_means, upper_thresholds)
+
+    messages = []
+    for column, not_great, splendid in zip(columns, is_not_great, is_splendid):
+        if not_great:
+            messages.append((column, _NOT_GREAT_THIS_WEEK.format(column)))
+        if splendid:
+            messages.append((column, _SPLENDID_THIS_WEEK.format(column)))
+    return messages
+
+
+def _to_float(df: pd.DataFrame) -> np.ndarray:
+    """The values of processed data as floats, with nan for missing values."""
+    return df.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _column_quantiles(values: np.ndarray, quantiles: list[float]) -> np.ndarray:
+    """Quantiles of all columns, skipping nan, as ``Series.quantile`` has them."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanquantile(values, quantiles, axis=0)
+
+
+def baseline_statistics(
+    df,
+    statistics_store,
+    columns: list[str] = PROPERTIES,
+    quantiles: list[float] = [0.4, 0.6],
+    verify: bool = False,
+) -> list[stats.RunningStatistics]:
+    """Running statistics of all values of ``columns``, one per column.
+
+    The statistics of the weeks before the current one are persisted in
+    ``statistics_store``, such that a run only adds the days which weren't
+    persisted yet. If ``verify``, the statistics are compared exactly with
+    those of all values, including the ``quantiles``, and recomputed from
+    scratch if they disagree.
+    """
+    values = _to_float(df[columns])
+    n_final = int((df["week"] < _this_week()).sum())
+    statistics = stats.update_statistics(statistics_store, columns, values, n_final)
+    if verify and not stats.is_consistent(statistics, values, quantiles):
+        tracing.log(
+            "Running statistics are inconsistent, recomputing them.",
+            severity="WARNING",
+        )
+        statistics = stats.update_statistics(
+            statistics_store, columns, values, n_final, reset=True
+        )
+    return statistics
 
 
 def messages_this_week(
-    df, columns: list[str] = PROPERTIES, lower_quantile=0.4, upper_quantile=0.6
+    df,
+    columns: list[str] = PROPERTIES,
+    lower_quantile=0.4,
+    upper_quantile=0.6,
+    statistics: Optional[list[stats.RunningStatistics]] = None,
 ) -> list[str]:
-    df_this_week = _df_this_week(df)
-    messages = []
-    for column in columns:
-        local_mean = df_this_week[column].mean()
-        is_inverted = column == "Stress"
-        if _has_weekly_message(
-            df[column],
-            local_mean,
-            quantile=lower_quantile,
-            is_inverted=is_inverted,
-            is_negative=True,
-        ):
-            messages.append(f"Oh. {column} was not so great this week.")
-        if _has_weekly_message(
-            df[column],
-            local_mean,
-            quantile=upper_quantile,
-            is_inverted=is_inverted,
-            is_negative=False,
-        ):
-            messages.append(f"Jeez! {column} was truly splendid this week.")
-    return messages
+    """Compare this week's means of ``columns`` with the quantiles of all days.
 
+    The quantiles are taken from running ``statistics`` of ``columns``, if
+    given, rather than computed from ``df``.
+    """
+    values = _to_float(df[columns])
+    with warnings.catch_warnings():
+        # Weeks without values have no local mean and thereby no message.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        local_means = np.nanmean(
+            values[(df["week"] == _this_week()).to_numpy()], axis=0
+        )
+    if statistics is None:
+        lower_thresholds, upper_thresholds = _column_quantiles(
+            values, [lower_quantile, upper_quantile]
+        )
+    else:
+        lower_thresholds, upper_thresholds = np.array(
+            [
+                [entry.quantile(lower_quantile), entry.quantile(upper_quantile)]
+                for entry in statistics
+            ]
+        ).T
+    return [
+        message
+        for _, message in _weekly_messages(
+            columns, local_means, lower_thresholds, upper_thresholds
+        )
+    ]
+
+
+def _daily_messages(
+    columns: list[str], last_two_days: np.ndarray, means, sigmas
+) -> list[tuple[str, str]]:
+    """Pairs of column and message for the last two complete days' values."""
+    is_inverted = _is_inverted(columns)
+    is_not_good_yesterday = _get_operators(
+        True,
+        is_inverted,
+        last_two_days[-1:],
+        _get_thresholds(True, is_inverted, means, 2 * sigmas),
+    ).all(axis=0)
+    is_problematic_two_days = _get_operators(
+        True,
+        is_inverted,
+        last_two_days,
+        _get_thresholds(True, is_inverted, means, sigmas),
+    ).all(axis=0)
 
-def messages_this_day(df, columns: list[str] = PROPERTIES) -> list[str]:
     messages = []
-    for column in columns:
-        non_nan_values = df[column].dropna()
-        global_sigma = _non_corrected_sd(non_nan_values)
-        global_mean = sum(non_nan_values) / len(non_nan_values)
-        is_inverted = column == "Stress"
-        if _has_daily_message(
-            _df_last_days(df, n_days=1)[column],
-            global_sigma,
-            global_mean,
-            n_days=1,
-            is_negative=True,
-            is_inverted=is_inverted,
-        ):
-            messages.append(
-                f"Hmm. {column} looked not good yesterday. What can be done?"
-            )
-        if _has_daily_message(
-            _df_last_days(df, n_days=2)[column],
-            global_sigma,
-            global_mean,
-            n_days=2,
-            is_negative=True,
-            is_inverted=is_inverted,
-        ):
-            messages.append(
-                f"{column} has looked problematic over the past two days. Take it easy pal."
-            )
+    for column, not_good_yesterday, problematic_two_days in zip(
+        columns, is_not_good_yesterday, is_problematic_two_days
+    ):
+        if not_good_yesterday:
+            messages.append((column, _NOT_GOOD_YESTERDAY.format(column)))
+        if problematic_two_days:
+            messages.append((column, _PROBLEMATIC_TWO_DAYS.format(column)))
     return messages
 
 
-def images_this_week(df, columns: list[str] = PROPERTIES, path=None) -> list[Path]:
+def _moments(
+    statistics: list[stats.RunningStatistics],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Means and non-corrected standard deviations, one per column."""
+    means, sigmas = np.array([entry.moments() for entry in statistics]).reshape(-1, 2).T
+    return means, sigmas
+
+
+def _column_statistics(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Mean and non-corrected standard deviation of all columns, skipping nan.
+
+    They are derived like those of running statistics, such that both agree
+    exactly, even for values right at a threshold.
+    """
+    return _moments([stats.RunningStatistics.of(column) for column in values.T])
+
+
+def messages_this_day(
+    df,
+    columns: list[str] = PROPERTIES,
+    statistics: Optional[list[stats.RunningStatistics]] = None,
+) -> list[str]:
+    """Compare the most recent complete days with the mean of all days.
+
+    The means and standard deviations are taken from running ``statistics``
+    of ``columns``, if given, rather than computed from ``df``.
+    """
+    values = _to_float(df[columns])
+    if statistics is None:
+        means, sigmas = _column_statistics(values)
+    else:
+        means, sigmas = _moments(statistics)
+    # Only days without any missing value are considered. There is no
+    # straightforward mapping between the current date and the day index.
+    is_complete = df.notna().all(axis="columns").to_numpy()
+    last_two_days = values[np.flatnonzero(is_complete)[-2:]]
+    return [
+        message for _, message in _daily_messages(columns, last_two_days, means, sigmas)
+    ]
+
+
+def _float_mean(df: pd.DataFrame, column: str) -> float:
+    return df[column].astype(np.float64).mean()
+
+
+def images_this_week(
+    df, columns: list[str] = PROPERTIES, dpi=images.DPI, figsize=images.FIGSIZE
+) -> list[io.BytesIO]:
     df_this_week = _df_this_week(df)
     n_dims = int(ceil(len(columns) ** 0.5))
-    fig, axs = plt.subplots(n_dims, n_dims)
-    counter = 0
-    for row in axs:
-        for ax in row:
-            if counter >= len(columns):
-                fig.delaxes(ax)
-                continue
-            column = columns[counter]
-            ax.set_title(column)
-            df_this_week.plot(y=column, ax=ax, style=".", label="_nolegend")
-            ax.axhline(df[column].mean(), label="avg ytd", color="orange")
-            ax.axhline(
-                _df_last_week(df)[column].mean(), label="avg last week", color="red"
-            )
-            ax.axhline(df_this_week[column].mean(), label="avg this week", color="blue")
-            ax.get_legend().remove()
-            counter += 1
-    handles, labels = axs[0][0].get_legend_handles_labels()
-    fig.suptitle(f"week {_this_week()}")
-    fig.legend(handles, labels, loc="lower right")
-    fig.subplots_adjust(hspace=0.7)
-    file_path = "this_week.png" if path is None else path / "this_week.png"
-    fig.savefig(file_path)
-    fig.show()
-    return [file_path]
+    with images.figure(figsize=figsize) as fig:
+        axs = fig.subplots(n_dims, n_dims, squeeze=False)
+        counter = 0
+        for row in axs:
+            for ax in row:
+                if counter >= len(columns):
+                    fig.delaxes(ax)
+                    continue
+                column = columns[counter]
+                ax.set_title(column)
+                ax.plot(
+                    df_this_week.index,
+                    _to_float(df_this_week[[column]]),
+                    ".",
+                    label="_nolegend",
+                )
+                # Means of missing values are nan rather than NA, which
+                # can't be plotted.
+                ax.axhline(_float_mean(df, column), label="avg ytd", color="orange")
+                ax.axhline(
+                    _float_mean(_df_last_week(df), column),
+                    label="avg last week",
+                    color="red",
+                )
+                ax.axhline(
+                    _float_mean(df_this_week, column),
+                    label="avg this week",
+                    color="blue",
+                )
+                counter += 1
+        handles, labels = axs[0][0].get_legend_handles_labels()
+        fig.suptitle(f"week {_this_week()}")
+        fig.legend(handles, labels, loc="lower right")
+        fig.subplots_adjust(hspace=0.7)
+        return [images.to_png(fig, name="this_week.png", dpi=dpi)]
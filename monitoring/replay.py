@@ -0,0 +1,258 @@
+"""Replay the notification rules on past data.
+
+Rather than re-slicing the history for every single day, the state needed by
+the rules is rolled forward day by day: period-to-date totals for the
+calendar rules and expanding statistics for the org rules.
+"""
+
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from . import cal, org, utils
+
+_COLUMNS = ["date", "subject", "rule", "message"]
+
+
+@dataclass(frozen=True)
+class _CubeAsOf(cal.AggregationCube):
+    """An ``AggregationCube`` as it looked at the end of ``day``."""
+
+    day: pd.Period
+    to_date: dict[str, pd.DataFrame]
+
+    @property
+    def current_day(self) -> pd.Period:
+        return self.day
+
+    def total(self, period: pd.Period, column: str = "distance") -> float:
+        current_period = self.day.asfreq(period.freq)
+        if period < current_period:
+            return super().total(period, column)
+        if period == current_period:
+            return self.to_date[period.freqstr[0]][column].get(self.day, 0)
+        return 0
+
+    def weeks(self, first: pd.Period, last: pd.Period) -> pd.DataFrame:
+        weeks = super().weeks(first, min(last, self.current_week - 1))
+        if last < self.current_week:
+            return weeks
+        current_week = self.to_date["W"].loc[[self.day]]
+        current_week.index = [self.current_week]
+        return pd.concat([weeks, current_week])
+
+
+@dataclass(frozen=True)
+class _ContextAsOf:
+    """The parts of an ``EvaluationContext`` used by the message functions."""
+
+    cube: _CubeAsOf
+    streaks: cal.Streaks
+    current_date: pd.Timestamp
+    current_year: int
+    current_month: int
+    current_week: int
+
+
+def _rolling_streaks(days: np.ndarray) -> list[cal.Streaks]:
+    """Streaks as of each of the sorted, unique ``days``."""
+    streaks = []
+    current = longest = longest_before_current = 0
+    yearly_longest = {}
+    ordinals = days.astype(int)
+    years = days.astype("datetime64[Y]").astype(int) + 1970
+    for index, (ordinal, year) in enumerate(zip(ordinals, years)):
+        if index > 0 and ordinal - ordinals[index - 1] == 1:
+            current += 1
+        else:
+            longest_before_current = longest
+            current = 1
+        longest = max(longest, current)
+        yearly_longest = yearly_longest | {
+            int(year): max(yearly_longest.get(int(year), 0), current)
+        }
+        streaks.append(
+            cal.Streaks(current, longest, longest_before_current, yearly_longest)
+        )
+    return streaks
+
+
+def _contexts_as_of(context: cal.EvaluationContext) -> dict[pd.Period, _ContextAsOf]:
+    """Build the context as of every active day in one pass over the history."""
+    cube = context.cube
+    daily = cube.daily
+    to_date = {
+        "D": daily,
+        "W": daily.groupby(daily.index.asfreq("W-SUN")).cumsum(),
+        "M": daily.groupby(daily.index.asfreq("M")).cumsum(),
+        "Y": daily.groupby(daily.index.asfreq("Y")).cumsum(),
+    }
+
+    df = context.df
+    days = df.index.tz_convert(None).to_period("D")
+    last_timestamps = df.index.to_series().groupby(days).transform("max")
+    is_last_event = (df.index == last_timestamps).to_numpy()
+    values = pd.DataFrame(
+        {"distance": df["distance"].fillna(0).to_numpy(), "count": 1}, index=days
+    )
+    last_events = values[is_last_event].groupby(level=0).sum()
+    last_rows = df[is_last_event].groupby(days[is_last_event]).last()
+
+    contexts = {}
+    for day, streaks in zip(last_events.index, _rolling_streaks(context.days)):
+        row = last_rows.loc[day]
+        contexts[day] = _ContextAsOf(
+            cube=_CubeAsOf(
+                daily=cube.daily,
+                weekly=cube.weekly,
+                monthly=cube.monthly,
+                yearly=cube.yearly,
+                last_event=last_events.loc[day],
+                day=day,
+                to_date=to_date,
+            ),
+            streaks=streaks,
+            current_date=row["date_string"],
+            current_year=int(row["year"]),
+            current_month=int(row["month"]),
+            current_week=int(row["week"]),
+        )
+    return contexts
+
+
+def _as_of_days(
+    active_days: pd.PeriodIndex,
+    first_date: datetime.date,
+    last_date: datetime.date,
+    interval: utils.TriggerInterval,
+) -> dict[datetime.date, pd.Period]:
+    """Map the dates of all (simulated) triggers to the day the rules are evaluated on.
+
+    Daily triggers are only followed up on if there was an event that very day,
+    weekly triggers happen on Sundays and require an event during that week.
+    """
+    if interval == utils.TriggerInterval.daily:
+        return {
+            day.to_timestamp().date(): day
+            for day in active_days
+            if first_date <= day.to_timestamp().date() <= last_date
+        }
+    if interval == utils.TriggerInterval.weekly:
+        as_of_days = {}
+        for sunday in pd.date_range(first_date, last_date, freq="W-SUN"):
+            sunday = pd.Period(sunday, freq="D")
+            position = active_days.searchsorted(sunday, side="right") - 1
+            if position >= 0 and active_days[position] > sunday - 7:
+                as_of_days[sunday.to_timestamp().date()] = active_days[position]
+        return as_of_days
+    raise ValueError(f"Unexpected TriggerInterval: {interval}.")
+
+
+def replay_calendar(
+    events,
+    first_date: datetime.date,
+    last_date: datetime.date,
+    interval: utils.TriggerInterval,
+) -> pd.DataFrame:
+    """Evaluate all calendar message functions as of every day in a range.
+
+    ``events`` can be the content of an ``EventStore``. Returns a table with
+    one row per generated message.
+    """
+    rows = []
+    for sport, sport_events in cal.partition_events(events).items():
+        message_functions = cal.message_function_registry(sport, interval)
+        if len(sport_events) == 0 or len(message_functions) == 0:
+            continue
+        contexts = _contexts_as_of(
+            cal.EvaluationContext(cal.get_dataframe(sport_events))
+        )
+        as_of_days = _as_of_days(
+            pd.PeriodIndex(list(contexts.keys()), freq="D"),
+            first_date,
+            last_date,
+            interval,
+        )
+        for date, day in as_of_days.items():
+            for message_function in message_functions:
+                message = message_function(contexts[day])
+                if message is not None and message != "":
+                    rows.append(
+                        (date, sport.value, message_function.func.__name__, message)
+                    )
+    return pd.DataFrame(rows, columns=_COLUMNS).sort_values(
+        ["date", "subject"], kind="stable", ignore_index=True
+    )
+
+
+def _replay_org_daily(df: pd.DataFrame, columns: list[str], year: int) -> list:
+    # ``messages_this_day`` only considers days without any missing value.
+    complete_positions = np.flatnonzero(df.notna().all(axis="columns").to_numpy())
+    values = org._to_float(df[columns])
+    dates = org.with_dates(df, year).index.date
+
+    rows = []
+    for position, date in enumerate(dates):
+        n_complete = np.searchsorted(complete_positions, position, side="right")
+        if n_complete == 0:
+            continue
+        last_two_days = values[complete_positions[max(n_complete - 2, 0) : n_complete]]
+        # The same statistics as the live rule's, such that both agree even on
+        # values right at a threshold.
+        means, sigmas = org._column_statistics(values[: position + 1])
+        # Columns without any value so far have nan means and no messages.
+        for column, message in org._daily_messages(
+            columns, last_two_days, means, sigmas
+        ):
+            rows.append((date, column, "messages_this_day", message))
+    return rows
+
+
+def _replay_org_weekly(
+    df: pd.DataFrame,
+    columns: list[str],
+    year: int,
+    lower_quantile: float,
+    upper_quantile: float,
+) -> list:
+    last_positions = (
+        df.reset_index(drop=True).groupby(df["week"].to_numpy()).tail(1).index
+    )
+    values = pd.DataFrame(org._to_float(df[columns]))
+    lower_thresholds = values.expanding().quantile(lower_quantile).to_numpy()
+    upper_thresholds = values.expanding().quantile(upper_quantile).to_numpy()
+    local_means = values.groupby(df["week"].to_numpy()).mean()
+    rows = []
+    for position in last_positions:
+        week = int(df["week"].iloc[position])
+        date = datetime.date.fromisocalendar(year, week, 7)
+        for column, message in org._weekly_messages(
+            columns,
+            local_means.loc[week].to_numpy(),
+            lower_thresholds[position],
+            upper_thresholds[position],
+        ):
+            rows.append((date, column, "messages_this_week", message))
+    return rows
+
+
+def replay_org(
+    df: pd.DataFrame,
+    year: int,
+    interval: utils.TriggerInterval,
+    columns: list[str] = org.PROPERTIES,
+    lower_quantile=0.4,
+    upper_quantile=0.6,
+) -> pd.DataFrame:
+    """Evaluate the org messages as of every day (or week) of processed data."""
+    if interval == utils.TriggerInterval.daily:
+        rows = _replay_org_daily(df, columns, year)
+    elif interval == utils.TriggerInterval.weekly:
+        rows = _replay_org_weekly(df, columns, year, lower_quantile, upper_quantile)
+    else:
+        raise ValueError(f"Unexpected TriggerInterval: {interval}.")
+    return pd.DataFrame(rows, columns=_COLUMNS).sort_values(
+        ["date"], kind="stable", ignore_index=True
+    )
@@ -1,68 +1,285 @@
-import io
+import contextvars
+import json
 import os
 import tempfile
-import zipfile
+import threading
+from collections import ChainMap
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Mapping, Optional, Union
 
-import requests
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from telegram import Bot
+from . import github, tracing
+from .store import DayStore, EventStore, StatisticsStore
+
+# Third-party clients are imported where they are needed: each trigger kind
+# only pays the import cost of the clients it uses.
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A user with their own calendar, org repository and Telegram chat.
+
+    ``config`` holds the settings which differ from the environment, such as
+    ``telegram_owner_id``, ``google_refresh_token`` or ``github_repo``.
+    """
+
+    name: str
+    config: dict[str, str]
+
+
+# The tenant whose trigger is being run, if any. Every thread starts without.
+_tenant = contextvars.ContextVar("tenant", default=None)
+
+
+def get_tenants() -> Optional[list[Tenant]]:
+    """Obtain the tenants of the registry in ``tenants_file``, if configured.
+
+    The registry is a JSON object mapping the name of every tenant to their
+    settings.
+    """
+    if (path := os.environ.get("tenants_file")) is None:
+        return None
+    return [
+        Tenant(name, config)
+        for name, config in json.loads(Path(path).read_text()).items()
+    ]
+
+
+def get_tenant_max_workers() -> int:
+    """Obtain the number of tenants served at once, ``tenant_max_workers``."""
+    return int(os.environ.get("tenant_max_workers", 8))
+
+
+@contextmanager
+def tenant_context(tenant: Tenant):
+    """Read the settings of ``tenant`` rather than those of the environment."""
+    token = _tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def _config() -> Mapping[str, str]:
+    if (tenant := _tenant.get()) is None:
+        return os.environ
+    return ChainMap(tenant.config, os.environ)
+
+
+def _tenant_dir(root: Union[str, Path]) -> Path:
+    """A directory of the current tenant within ``root``."""
+    if (tenant := _tenant.get()) is None:
+        return Path(root)
+    return Path(root) / tenant.name
 
 
 def get_telegram_owner_id():
-    return os.environ["telegram_owner_id"]
+    return _config()["telegram_owner_id"]
+
+
+# Clients survive across invocations on a warm instance. Tenants look them up
+# from several threads; factories may look up other clients, hence reentrant.
+_clients = {}
+_clients_lock = threading.RLock()
+
+
+def _get_client(key: tuple, factory, shared: bool = False):
+    """Obtain a cached client or create and cache it with ``factory``.
+
+    Unless ``shared``, clients are cached per tenant: clients hold sessions
+    which must not be used by several threads at once.
+    """
+    if not shared and (tenant := _tenant.get()) is not None:
+        key = (*key, tenant.name)
+    with _clients_lock:
+        if key in _clients:
+            tracing.log(f"Client cache hit: {key[0]}.", client=key[0])
+            tracing.count("client_cache_hits")
+            return _clients[key]
+        tracing.log(f"Client cache miss: {key[0]}.", client=key[0])
+        tracing.count("client_cache_misses")
+        _clients[key] = factory()
+        return _clients[key]
 
 
 def get_bot():
-    token = os.environ["telegram_token"]
-    return Bot(token=token)
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+
+    token = _config()["telegram_token"]
+    # The bot opens a new session, and thereby connection pool, for every
+    # ``async with bot`` block. The pool only needs to cover the requests in
+    # flight at once.
+    return _get_client(
+        ("telegram", token),
+        lambda: Bot(token=token, request=HTTPXRequest(connection_pool_size=8)),
+    )
 
 
 def _get_calendar_credentials():
+    from google.oauth2.credentials import Credentials
+
+    config = _config()
+    # Without a token, the access token is obtained via the refresh token
+    # before the first request. The credentials refresh themselves once the
+    # access token expired.
     return Credentials(
-        "access_token",
-        refresh_token=os.environ["google_refresh_token"],
-        token_uri=os.environ["google_token_uri"],
-        client_id=os.environ["google_client_id"],
-        client_secret=os.environ["google_client_secret"],
+        None,
+        refresh_token=config["google_refresh_token"],
+        token_uri=config["google_token_uri"],
+        client_id=config["google_client_id"],
+        client_secret=config["google_client_secret"],
+    )
+
+
+def _get_discovery_document() -> dict:
+    """The discovery document of the Calendar API, parsed once for all tenants."""
+
+    def load():
+        from googleapiclient.discovery_cache import get_static_doc
+
+        # The static discovery document ships with the client library, such
+        # that it needn't be downloaded.
+        return json.loads(get_static_doc("calendar", "v3"))
+
+    return _get_client(("calendar-discovery",), load, shared=True)
+
+
+def _build_calendar_service():
+    from googleapiclient.discovery import build_from_document
+
+    # Building from the document doesn't send any request.
+    return build_from_document(
+        _get_discovery_document(), credentials=_get_calendar_credentials()
     )
 
 
 def get_calendar_service():
-    try:
-        service = build("calendar", "v3", credentials=_get_calendar_credentials())
-    except HttpError as error:
-        print("An error occurred: %s" % error)
-    return service
+    config = _config()
+    return _get_client(
+        (
+            "calendar",
+            config["google_client_id"],
+            config["google_refresh_token"],
+        ),
+        _build_calendar_service,
+    )
+
+
+def get_http_session():
+    import requests
+
+    return _get_client(("http",), requests.Session)
+
+
+def get_event_store():
+    """Obtain the persistent event store, if configured.
+
+    Without an ``event_store_dir``, the calendar is fetched in full on every run.
+    """
+    if (root := _config().get("event_store_dir")) is None:
+        return None
+    return EventStore(_tenant_dir(root))
+
+
+def get_day_store():
+    """Obtain the persistent store of org day data, if configured.
+
+    Every org trigger replaces the partition of the current year in
+    ``org_store_dir``, such that multiple years can be queried by date.
+    """
+    if (root := _config().get("org_store_dir")) is None:
+        return None
+    return DayStore(_tenant_dir(root))
+
+
+def get_executor(prefix: str = "gcal"):
+    """Obtain the executor spreading the work of a trigger.
+
+    ``gcal_executor`` can be 'serial' (default), 'process' or 'thread',
+    ``gcal_max_workers`` bounds the number of workers. Only multi-core
+    instances benefit from a pool. With ``prefix='org'``, ``org_executor`` and
+    ``org_max_workers`` configure the parsing of org files.
+    """
+    config = _config()
+    kind = config.get(f"{prefix}_executor", "serial")
+    max_workers = (
+        int(config[f"{prefix}_max_workers"])
+        if f"{prefix}_max_workers" in config
+        else None
+    )
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if kind == "serial":
+        return ThreadPoolExecutor(max_workers=1)
+    raise ValueError(f"Unexpected {prefix}_executor: {kind}.")
+
+
+def submit(executor: Executor, function, *args, **kwargs) -> Future:
+    """Submit ``function`` to run in a copy of the caller's context.
+
+    Threads thereby see the current tenant and the fields of its log lines.
+    Contexts can't be passed on to worker processes, which start from the
+    environment's settings.
+    """
+    if isinstance(executor, ProcessPoolExecutor):
+        return executor.submit(function, *args, **kwargs)
+    return executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
 
 
 def get_tmpdir():
     return Path(tempfile.gettempdir())
 
 
+def get_org_cache_dir() -> Path:
+    """Obtain the directory caching derived org data, e.g. running statistics.
+
+    ``org_cache_dir`` can point to persistent storage. Otherwise, the cache
+    only survives on warm instances.
+    """
+    if (root := _config().get("org_cache_dir")) is not None:
+        return Path(root)
+    return get_tmpdir() / "org-cache"
+
+
+def get_statistics_store(year: int) -> StatisticsStore:
+    """Obtain the store of the running statistics of the org data of ``year``."""
+    config = _config()
+    return StatisticsStore(
+        _tenant_dir(get_org_cache_dir())
+        / config["github_username"]
+        / config["github_repo"]
+        / f"statistics-{year}.json"
+    )
+
+
 def create_and_get_week_dir(week: str = "24-weeks") -> Path:
-    username = os.environ["github_username"]
-    repo = os.environ["github_repo"]
-    ref = os.environ["github_ref"]
-    pat = os.environ["github_pat"]
+    """Mirror the week files of the org repository into the temporary directory.
 
-    url = f"https://api.github.com/repos/{username}/{repo}/zipball/{ref}"
+    The mirror persists on warm instances, such that only files which changed
+    since the previous run are downloaded.
+    """
+    config = _config()
+    username = config["github_username"]
+    repo = config["github_repo"]
+    ref = config["github_ref"]
+    pat = config["github_pat"]
 
     headers = {
-        "Accept": "application/vnd.github+json",
         "Authorization": f"Bearer {pat}",
         "X-GitHub-Api-Version": "2022-11-28",
     }
 
-    response = requests.get(url, headers=headers)
-
-    tmpdir = get_tmpdir() / "org"
-    tmpdir.mkdir(exist_ok=True)
-
-    z = zipfile.ZipFile(io.BytesIO(response.content))
-    z.extractall(tmpdir)
-
-    weeks_dir = tmpdir / z.filelist[0].filename / week
-    return weeks_dir
+    return github.sync_directory(
+        get_http_session(),
+        username,
+        repo,
+        ref,
+        week,
+        _tenant_dir(get_tmpdir() / "org") / username / repo / week,
+        headers,
+    )
@@ -0,0 +1,189 @@
+"""Running statistics of series, updated run by run rather than recomputed."""
+
+import hashlib
+from dataclasses import dataclass, field
+from fractions import Fraction
+from math import floor, sqrt
+from typing import Optional
+
+import numpy as np
+
+from . import tracing
+
+_STATE_VERSION = 2
+
+
+@dataclass
+class RunningStatistics:
+    """Value counts of a series, from which its statistics are derived exactly.
+
+    The mean and standard deviation are computed with exact fractions and only
+    rounded at the end, such that they don't depend on the order in which the
+    values were added. The value counts stay small for the discrete values of
+    the org files: score codes and fasting hours.
+    """
+
+    value_counts: dict[float, int] = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, values: np.ndarray) -> "RunningStatistics":
+        statistics = cls()
+        statistics.update(values)
+        return statistics
+
+    def update(self, values: np.ndarray):
+        """Add all values which aren't nan."""
+        unique, counts = np.unique(values[~np.isnan(values)], return_counts=True)
+        for value, value_count in zip(unique.tolist(), counts.tolist()):
+            self.value_counts[value] = self.value_counts.get(value, 0) + value_count
+
+    def merge(self, other: "RunningStatistics") -> "RunningStatistics":
+        """Combine the statistics of two disjoint sets of values."""
+        value_counts = dict(self.value_counts)
+        for value, value_count in other.value_counts.items():
+            value_counts[value] = value_counts.get(value, 0) + value_count
+        return RunningStatistics(value_counts)
+
+    @property
+    def count(self) -> int:
+        return sum(self.value_counts.values())
+
+    def moments(self) -> tuple[float, float]:
+        """The mean and non-corrected standard deviation, nan without values."""
+        count = self.count
+        if count == 0:
+            return np.nan, np.nan
+        mean = (
+            sum(Fraction(value) * n for value, n in self.value_counts.items()) / count
+        )
+        variance = (
+            sum(
+                (Fraction(value) - mean) ** 2 * n
+                for value, n in self.value_counts.items()
+            )
+            / count
+        )
+        return float(mean), sqrt(variance)
+
+    def quantile(self, q: float) -> float:
+        """The quantile as ``np.quantile`` interpolates it, nan without values."""
+        if self.count == 0:
+            return np.nan
+        values = np.array(sorted(self.value_counts))
+        ends = np.cumsum([self.value_counts[value] for value in values])
+        position = q * (self.count - 1)
+        lower = floor(position)
+        below, above = values[
+            np.searchsorted(ends, [lower, min(lower + 1, self.count - 1)], "right")
+        ]
+        # NumPy's interpolation, which is exact at both ends.
+        weight = position - lower
+        if weight >= 0.5:
+            return float(above - (above - below) * (1 - weight))
+        return float(below + (above - below) * weight)
+
+    def to_dict(self) -> dict:
+        # JSON only allows strings as keys.
+        return {"value_counts": list(self.value_counts.items())}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "RunningStatistics":
+        return cls({float(value): int(count) for value, count in state["value_counts"]})
+
+
+def _digest(values: np.ndarray) -> str:
+    # nan has many bit patterns.
+    values = np.where(np.isnan(values), np.nan, values).astype(np.float64)
+    return hashlib.sha256(np.ascontiguousarray(values).tobytes()).hexdigest()
+
+
+def _restore(
+    state: Optional[dict], columns: list[str], values: np.ndarray, n_final: int
+) -> tuple[list[RunningStatistics], int]:
+    """The persisted statistics and the number of rows they cover.
+
+    Without a state which is valid for the given rows, no rows are covered.
+    """
+    empty = [RunningStatistics() for _ in columns]
+    if state is None:
+        tracing.log("No statistics state, computing the statistics from scratch.")
+        return empty, 0
+    try:
+        if state["version"] != _STATE_VERSION or state["columns"] != columns:
+            raise ValueError("unexpected version or columns")
+        n_rows = int(state["n_rows"])
+        if n_rows > n_final or _digest(values[:n_rows]) != state["digest"]:
+            tracing.log(
+                "Persisted rows changed, computing the statistics from scratch."
+            )
+            return empty, 0
+        statistics = [
+            RunningStatistics.from_dict(entry) for entry in state["columns_statistics"]
+        ]
+        if len(statistics) != len(columns):
+            raise ValueError("unexpected number of statistics")
+    except (KeyError, TypeError, ValueError) as error:
+        tracing.log(
+            f"Corrupt statistics state ({error}), computing them from scratch.",
+            severity="WARNING",
+        )
+        return empty, 0
+    return statistics, n_rows
+
+
+def update_statistics(
+    statistics_store,
+    columns: list[str],
+    values: np.ndarray,
+    n_final: int,
+    reset: bool = False,
+) -> list[RunningStatistics]:
+    """Statistics of every column of ``values``, a row per observation.
+
+    The first ``n_final`` rows are not expected to change anymore. The state
+    of ``statistics_store`` covers a prefix of them, such that only the rows
+    after it are added. If the state is missing, corrupt or covers rows which
+    have since changed, or if ``reset``, all rows are added anew. The
+    remaining rows are added on the fly without being persisted.
+    """
+    state = None if reset else statistics_store.load()
+    statistics, start = _restore(state, columns, values, n_final)
+    if start < n_final:
+        for column_statistics, column_values in zip(
+            statistics, values[start:n_final].T
+        ):
+            column_statistics.update(column_values)
+        statistics_store.save(
+            {
+                "version": _STATE_VERSION,
+                "columns": columns,
+                "n_rows": n_final,
+                "digest": _digest(values[:n_final]),
+                "columns_statistics": [entry.to_dict() for entry in statistics],
+            }
+        )
+    return [
+        column_statistics.merge(RunningStatistics.of(column_values))
+        for column_statistics, column_values in zip(statistics, values[n_final:].T)
+    ]
+
+
+def is_consistent(
+    statistics: list[RunningStatistics], values: np.ndarray, quantiles: list[float]
+) -> bool:
+    """Whether the statistics equal those computed exactly from ``values``.
+
+    The comparison is exact, such that thresholds derived from consistent
+    statistics are the very same as from ``values``.
+    """
+    for column_statistics, column_values in zip(statistics, values.T):
+        exact = RunningStatistics.of(column_values)
+        if column_statistics.value_counts != exact.value_counts:
+            return False
+        if exact.count == 0:
+            continue
+        present = column_values[~np.isnan(column_values)]
+        actual = [column_statistics.quantile(q) for q in quantiles]
+        if actual != np.quantile(present, quantiles).tolist():
+            return False
+    return True
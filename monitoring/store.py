@@ -0,0 +1,163 @@
+import datetime
+import io
+import json
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from . import tracing
+
+_EVENTS_FILE = "events.json"
+_SYNC_TOKEN_FILE = "sync_token"
+_PARTITION_SUFFIX = ".npz"
+# Masks of missing values are stored next to the integer codes of a column.
+_MASK_SUFFIX = ".missing"
+
+
+def _write_atomically(path: Path, content: Union[str, bytes]):
+    # Writing to a sibling file and renaming it guarantees that a crashed run
+    # never leaves a half-written store behind.
+    tmp_path = path.with_name(path.name + ".tmp")
+    if isinstance(content, bytes):
+        tmp_path.write_bytes(content)
+    else:
+        tmp_path.write_text(content)
+    os.replace(tmp_path, path)
+
+
+class EventStore:
+    """Persist normalized calendar events and the Calendar sync token.
+
+    The store is a plain directory. In production, this directory can be a
+    bucket mounted into the file system.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def events_path(self) -> Path:
+        return self.root / _EVENTS_FILE
+
+    @property
+    def sync_token_path(self) -> Path:
+        return self.root / _SYNC_TOKEN_FILE
+
+    def load_events(self) -> dict[str, dict]:
+        if not self.events_path.exists():
+            return {}
+        return json.loads(self.events_path.read_text())
+
+    def load_sync_token(self) -> Optional[str]:
+        # Without events, a sync token is useless: we need a full sync.
+        if not self.sync_token_path.exists() or not self.events_path.exists():
+            return None
+        return self.sync_token_path.read_text().strip() or None
+
+    def save(self, events: dict[str, dict], sync_token: Optional[str]):
+        _write_atomically(self.events_path, json.dumps(events))
+        if sync_token is None:
+            self.sync_token_path.unlink(missing_ok=True)
+        else:
+            _write_atomically(self.sync_token_path, sync_token)
+
+
+class DayStore:
+    """Persist daily org data column-wise, one partition per (ISO) year.
+
+    A partition is a ``.npz`` file holding the dates and one array per column.
+    Queries only read the partitions of the years they cover.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _partition_path(self, year: int) -> Path:
+        return self.root / f"{year}{_PARTITION_SUFFIX}"
+
+    def years(self) -> list[int]:
+        return sorted(
+            int(path.stem) for path in self.root.glob(f"*{_PARTITION_SUFFIX}")
+        )
+
+    def save_year(self, year: int, df: pd.DataFrame):
+        """Replace the partition of ``year`` by ``df``, which is indexed by date."""
+        if (df.index.isocalendar().year != year).any():
+            raise ValueError(f"Encountered dates outside of the ISO year {year}.")
+        arrays = {"date": df.index.to_numpy()}
+        for column in df.columns:
+            values = df[column].array
+            if isinstance(values, pd.arrays.IntegerArray):
+                arrays[column] = values.to_numpy(
+                    dtype=values.dtype.numpy_dtype, na_value=0
+                )
+                arrays[column + _MASK_SUFFIX] = values.isna()
+            else:
+                arrays[column] = values.to_numpy()
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        _write_atomically(self._partition_path(year), buffer.getvalue())
+
+    def load_year(self, year: int) -> pd.DataFrame:
+        with np.load(self._partition_path(year)) as partition:
+            columns = {}
+            for name in partition.files:
+                if name == "date" or name.endswith(_MASK_SUFFIX):
+                    continue
+                columns[name] = partition[name]
+                if name + _MASK_SUFFIX in partition.files:
+                    columns[name] = pd.arrays.IntegerArray(
+                        columns[name], partition[name + _MASK_SUFFIX]
+                    )
+            return pd.DataFrame(
+                columns, index=pd.DatetimeIndex(partition["date"], name="date")
+            )
+
+    def load(
+        self,
+        start: Optional[datetime.date] = None,
+        end: Optional[datetime.date] = None,
+    ) -> pd.DataFrame:
+        """Load the days from ``start`` to ``end``, both inclusive and optional."""
+        first_year = None if start is None else start.isocalendar().year
+        last_year = None if end is None else end.isocalendar().year
+        years = [
+            year
+            for year in self.years()
+            if (first_year is None or year >= first_year)
+            and (last_year is None or year <= last_year)
+        ]
+        if len(years) == 0:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+        df = pd.concat([self.load_year(year) for year in years])
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index <= pd.Timestamp(end)]
+        return df
+
+
+class StatisticsStore:
+    """Persist the state of running statistics in a JSON file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> Optional[dict]:
+        """The state, None if there is none or if it can't be read."""
+        if not self.path.exists():
+            return None
+        try:
+            return json.loads(self.path.read_text())
+        except ValueError:
+            tracing.log(f"Can't read statistics state {self.path}.", severity="WARNING")
+            return None
+
+    def save(self, state: dict):
+        _write_atomically(self.path, json.dumps(state))
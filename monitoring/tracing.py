@@ -0,0 +1,126 @@
+"""Structured instrumentation of the stages of a trigger run.
+
+Every stage emits a JSON log line with its duration and counters, such as
+API calls or cache hits. Cloud Logging ingests JSON lines printed to stdout as
+structured entries, with ``severity`` and ``message`` as their special fields.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+_lock = threading.Lock()
+# Fields, stages and the totals of the run live in the context, such that they
+# are passed on to work submitted with ``setup.submit``, but concurrently
+# evaluated sports and tenants, or concurrent runs, don't count towards each
+# other's stages.
+_fields = contextvars.ContextVar("tracing_fields", default={})
+_stages = contextvars.ContextVar("tracing_stages", default=())
+# The stage durations and the counters of the current run, if any.
+_totals = contextvars.ContextVar("tracing_totals", default=None)
+
+
+def log(message: str, severity: str = "INFO", **fields):
+    """Emit a structured log line."""
+    entry = {"severity": severity, "message": message} | _fields.get() | fields
+    print(json.dumps(entry, default=str), flush=True)
+
+
+def count(name: str, value: int = 1):
+    """Add ``value`` to a counter of the current stage and of the run."""
+    with _lock:
+        if (totals := _totals.get()) is not None:
+            totals[1][name] += value
+        if len(stages := _stages.get()) > 0:
+            stages[-1][name] = stages[-1].get(name, 0) + value
+
+
+def set_fields(**fields):
+    """Add fields to every further log line of the current context."""
+    _fields.set(_fields.get() | fields)
+
+
+@contextmanager
+def context_fields(**fields):
+    """Add fields to the log lines of the current context within the block."""
+    token = _fields.set(_fields.get() | fields)
+    try:
+        yield
+    finally:
+        _fields.reset(token)
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """Time a stage and log its duration and counters once it's left."""
+    counters = {}
+    token = _stages.set(_stages.get() + (counters,))
+    severity = "INFO"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as error:
+        severity = "ERROR"
+        fields["error"] = repr(error)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _stages.reset(token)
+        if (totals := _totals.get()) is not None:
+            with _lock:
+                totals[0][name] += duration
+        log(
+            f"Stage {name} took {duration:.3f}s.",
+            severity=severity,
+            stage=name,
+            duration_s=round(duration, 6),
+            **fields,
+            **counters,
+        )
+
+
+def _profile_path(profile_dir: Path) -> Path:
+    name = "-".join(str(value) for value in _fields.get().values()) or "run"
+    return Path(profile_dir) / f"{name}-{time.strftime('%Y%m%dT%H%M%S')}.prof"
+
+
+@contextmanager
+def run():
+    """Trace a trigger run and log a summary of all its stages.
+
+    With ``profile_dir`` set, the run is profiled with cProfile and the
+    statistics are dumped into that directory, e.g. for ``snakeviz``. Stages
+    run in worker processes are logged, but not part of the summary.
+    """
+    token = _fields.set({})
+    totals_token = _totals.set((defaultdict(float), defaultdict(int)))
+    profile_dir = os.environ.get("profile_dir")
+    if profile_dir is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if profile_dir is not None:
+            profiler.disable()
+            Path(profile_dir).mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path := _profile_path(profile_dir))
+            log(f"Dumped profile to {path}.", profile=str(path))
+        stage_durations, counters = _totals.get()
+        log(
+            f"Run took {duration:.3f}s.",
+            duration_s=round(duration, 6),
+            stages={name: round(value, 6) for name, value in stage_durations.items()},
+            counters=dict(counters),
+        )
+        _totals.reset(totals_token)
+        _fields.reset(token)
@@ -4,6 +4,8 @@ import json
 from enum import Enum
 from math import log
 
+from . import tracing
+
 
 class Sport(Enum):
     running = "running"
@@ -49,13 +51,12 @@ def last_of_dec_timestamp(year):
 
 
 def parse_payload(request):
-    # TODO: Use google cloud logging system instead of prints.
-    print(f"Received payload: {request}")
+    tracing.log("Received payload.", payload=request)
     message = base64.b64decode(request["data"]).decode("utf-8")
     try:
         request_json = json.loads(message)
     except ValueError as e:
-        print(f"Error decoding JSON: {e}")
+        tracing.log(f"Error decoding JSON: {e}", severity="ERROR")
         return "JSON Error", 400
     return request_json.get("kind") or "default"
 
@@ -0,0 +1,171 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+
+# TODO: Get rid of path hack.
+import sys
+from pathlib import Path
+
+import pytest
+from telegram.error import RetryAfter
+
+import main
+from benchmarks import data, fakes, hot_paths, load, startup
+from monitoring import cal, org, setup, utils
+
+sys.path.insert(0, os.path.abspath(".."))
+
+
+def test_calendar_events():
+    events = data.calendar_events(n_years=2)
+    assert events == data.calendar_events(n_years=2)
+    df = cal.get_dataframe(events)
+    assert df["year"].unique().tolist() == [2023, 2024]
+    running = cal.get_dataframe(cal.partition_events(events)[utils.Sport.running])
+    assert running["distance"].notna().all()
+
+
+def test_org_week_dirs(tmp_path):
+    week_dirs = data.org_week_dirs(tmp_path, n_years=2)
+    assert [week_dir.name for week_dir in week_dirs] == ["23-weeks", "24-weeks"]
+    df = org.load_data(max_week=52, week_root=week_dirs[-1])
+    assert df.shape == (364, len(org.PROPERTIES) + 1)
+    assert df.equals(
+        org.load_data(max_week=52, week_root=week_dirs[-1], engine="orgparse")
+    )
+
+
+def test_growth_exponent():
+    assert hot_paths.growth_exponent({1: 1.0, 5: 3.0, 10: 100.0}) == pytest.approx(2)
+    assert hot_paths.growth_exponent({1: 1.0, 20: 20.0}) == pytest.approx(1)
+
+
+def test_telegram_stand_in_rate_limits():
+    bot = fakes.TelegramBot(messages_per_second=1)
+
+    async def send_twice():
+        await bot.send_message(1, "first")
+        await bot.send_message(2, "other chat")
+        await bot.send_message(1, "second")
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(send_twice())
+    assert [text for _, _, text in bot.sent] == ["first", "other chat"]
+
+
+@pytest.mark.parametrize(
+    "kind, expected, unexpected",
+    [
+        (
+            "org_daily",
+            ["monitoring.org", "requests", "telegram"],
+            ["matplotlib.figure", "googleapiclient.discovery"],
+        ),
+        (
+            "calendar_weekly",
+            [
+                "monitoring.cal",
+                "googleapiclient.discovery",
+                "google.oauth2.credentials",
+                "matplotlib.figure",
+            ],
+            [],
+        ),
+    ],
+)
+def test_trace_imports(monkeypatch, kind, expected, unexpected):
+    # The clients' factories only run, and import, on a cache miss.
+    monkeypatch.setattr(setup, "_clients", {})
+    modules = startup.trace_imports(kind)
+    assert set(expected) <= set(modules)
+    assert set(unexpected).isdisjoint(modules)
+
+
+def test_offline_triggers(tmp_path):
+    with load.offline(tmp_path, n_years=1, messages_per_second=1000) as stand_ins:
+        for kind in load.KINDS:
+            with contextlib.redirect_stdout(io.StringIO()):
+                main.main(load.payload(kind), None)
+        assert stand_ins.github.n_calls > 1
+        assert any(kind == "photo" for _, kind, _ in stand_ins.telegram.sent)
+
+        # Warm runs only check for changes.
+        n_github_calls = stand_ins.github.n_calls
+        main.main(load.payload("org_daily"), None)
+        assert stand_ins.github.n_calls == n_github_calls + 1
+        n_calendar_calls = stand_ins.calendar.n_calls
+        main.main(load.payload("calendar_daily"), None)
+        assert stand_ins.calendar.n_calls == n_calendar_calls + 1
+
+
+def test_fan_out_isolates_failures(tmp_path):
+    with load.offline(tmp_path, n_years=1, n_tenants=3):
+        tenants_file = Path(os.environ["tenants_file"])
+        tenants = json.loads(tenants_file.read_text())
+        tenants["tenant1"]["org_executor"] = "unknown"
+        tenants_file.write_text(json.dumps(tenants))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main.main(load.payload("org_daily"), None)
+
+    lines = [
+        json.loads(line)
+        for line in output.getvalue().splitlines()
+        if line.startswith("{")
+    ]
+    summary = next(line for line in lines if "failed_tenants" in line)
+    assert summary["failed_tenants"] == ["tenant1"]
+    assert {line.get("tenant") for line in lines if line.get("stage") == "compute"} == {
+        "tenant0",
+        "tenant2",
+    }
+    for tenant in [0, 2]:
+        assert (tmp_path / "tmp" / "org" / f"tenant{tenant}").exists()
+
+
+def test_sport_stages_carry_tenant_and_trigger(tmp_path, monkeypatch):
+    monkeypatch.setenv("gcal_executor", "thread")
+    with load.offline(tmp_path, n_years=1, n_tenants=2):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main.main(load.payload("calendar_daily"), None)
+
+    sport_stages = [
+        json.loads(line)
+        for line in output.getvalue().splitlines()
+        if line.startswith("{") and "sport" in json.loads(line)
+    ]
+    assert len(sport_stages) > 0
+    assert {(line["tenant"], line["trigger"]) for line in sport_stages} == {
+        ("tenant0", "calendar_daily"),
+        ("tenant1", "calendar_daily"),
+    }
+
+
+def test_invalid_event_only_affects_its_sport(tmp_path):
+    with load.offline(tmp_path, n_years=1, messages_per_second=1000) as stand_ins:
+        invalid = {
+            "id": "invalid",
+            "summary": "Running",
+            "start": {"dateTime": "2024-01-01T08:00:00+01:00"},
+            "description": "1.x km",
+        }
+        stand_ins.calendar.items.append(invalid)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main.main(load.payload("calendar_weekly"), None)
+
+    lines = [
+        json.loads(line)
+        for line in output.getvalue().splitlines()
+        if line.startswith("{")
+    ]
+    (failure,) = [line for line in lines if "traceback" in line]
+    assert (failure["severity"], failure["sport"]) == ("ERROR", "running")
+    assert "invalid distance" in failure["message"]
+    computed = {line["sport"] for line in lines if line.get("stage") == "compute"}
+    assert "running" not in computed
+    assert "cycling" in computed
+    assert len(stand_ins.telegram.sent) > 0
@@ -1,11 +1,16 @@
+import datetime
+import json
 import os
 
 # TODO: Get rid of path hack.
 import sys
 
+import numpy as np
+import pandas as pd
 import pytest
 
-from monitoring import cal, utils
+from benchmarks import fakes
+from monitoring import cal, store, tracing, utils
 
 sys.path.insert(0, os.path.abspath(".."))
 
@@ -177,8 +182,256 @@ def test_streak(events, data):
     duration, expected_result = data
     filter_function = cal._get_summary_filter(sport)
     running_events = list(filter(filter_function, events))
-    df = cal.get_dataframe(running_events)
+    context = cal.EvaluationContext(cal.get_dataframe(running_events))
     actual_result = (
-        cal.streak(df, utils.Sport.running, minimal_duration=duration) is not None
+        cal.streak(context, utils.Sport.running, minimal_duration=duration) is not None
     )
     assert actual_result == expected_result
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        (utils.Sport.running, 4),
+        (utils.Sport.gym, 2),
+        (utils.Sport.gym_ub, 1),
+        (utils.Sport.cycling, 0),
+    ],
+)
+def test_partition_events(data, events):
+    sport, expected_count = data
+    partitions = cal.partition_events(events)
+    assert set(partitions) == set(utils.Sport)
+    assert len(partitions[sport]) == expected_count
+
+
+def _event(event_id, day, summary="Running", status="confirmed"):
+    return {
+        "id": event_id,
+        "status": status,
+        "summary": summary,
+        "description": "10 km",
+        "start": {"dateTime": f"2020-01-0{day}T08:30:00+01:00"},
+    }
+
+
+def test_sync_events_incremental(tmp_path):
+    event_store = store.EventStore(tmp_path)
+    start, end = "2020-01-01T00:00:00Z", "2020-01-09T00:00:00Z"
+
+    service = fakes.CalendarService([_event("a", 1), _event("b", 2)], max_page_size=1)
+    events = cal.sync_events(service, event_store, start, end)
+    assert [event["id"] for event in events] == ["a", "b"]
+    assert "syncToken" not in service.calls[0]
+
+    n_calls = len(service.calls)
+    service.update([_event("a", 1, status="cancelled"), _event("c", 3)])
+    events = cal.sync_events(service, event_store, start, end)
+    assert [event["id"] for event in events] == ["b", "c"]
+    assert service.calls[n_calls]["syncToken"] == "sync-0"
+    assert service.calls[n_calls]["maxResults"] == cal._PAGE_SIZE
+    assert event_store.load_sync_token() == "sync-1"
+
+
+def test_sync_events_expired_token(tmp_path):
+    event_store = store.EventStore(tmp_path)
+    event_store.save({"a": _event("a", 1)}, "expired")
+    service = fakes.CalendarService([_event("b", 2)])
+
+    events = cal.sync_events(
+        service, event_store, "2020-01-01T00:00:00Z", "2020-01-09T00:00:00Z"
+    )
+
+    assert [event["id"] for event in events] == ["b"]
+    assert event_store.load_sync_token() == "sync-0"
+
+
+def test_get_events_pagination():
+    service = fakes.CalendarService(
+        [_event("a", 1), _event("b", 2), _event("c", 3)], max_page_size=1
+    )
+    events = cal.get_events(service, "2020-01-01T00:00:00Z", "2020-01-09T00:00:00Z")
+    assert [event["id"] for event in events] == ["a", "b", "c"]
+    calls = service.calls
+    assert [call["pageToken"] for call in calls] == [None, "1", "2"]
+    assert all("items(" in call["fields"] for call in calls)
+
+
+def test_get_events_counts_calls(capsys):
+    service = fakes.CalendarService([_event("a", 1), _event("b", 2)], max_page_size=1)
+    with tracing.stage("fetch"):
+        events = cal.get_events(service, "2020-01-01T00:00:00Z", "2020-01-09T00:00:00Z")
+        assert [event["id"] for event in events] == ["a", "b"]
+    fetch = json.loads(capsys.readouterr().out)
+    assert (fetch["calendar_api_calls"], fetch["calendar_events"]) == (2, 2)
+
+
+def test_prune_events_reports_all_failures(events):
+    flawed_events = [
+        {**events[0], "summary": "Running w/ Bob"},
+        events[1],
+        {**events[2], "description": "1.x km"},
+        {**events[3], "start": {"dateTime": "2020-01-z8:30:00+01:00"}},
+    ]
+    with pytest.raises(ValueError, match="3 invalid events") as error:
+        cal.prune_events(flawed_events)
+    assert "invalid sport" in str(error.value)
+    assert "invalid distance" in str(error.value)
+    assert "invalid date" in str(error.value)
+
+
+def test_get_dataframe_calendar_columns(events):
+    df = cal.get_dataframe(events)
+    assert df.index.is_monotonic_increasing
+    assert df["year"].tolist() == [2020] * len(events)
+    assert df["week"].tolist() == [1] * 5 + [2] * 2
+    assert df["day"].tolist() == list(range(1, 8))
+    assert df["hour"].tolist() == [7] * len(events)
+
+
+def _running_events(dates_and_distances):
+    return [
+        {
+            "summary": "Running",
+            "description": f"{distance} km",
+            "start": {"dateTime": f"{date}T08:30:00+00:00"},
+        }
+        for date, distance in dates_and_distances
+    ]
+
+
+def test_get_cube(events):
+    cube = cal.get_cube(
+        cal.get_dataframe(cal.partition_events(events)[utils.Sport.running])
+    )
+    assert len(cube.daily) == 7
+    assert cube.total(cube.current_day, "count") == 1
+    assert cube.total(cube.current_day - 1, "count") == 1
+    # The 2nd to 4th of January are filled up with zeros.
+    assert cube.total(cube.current_day - 4, "distance") == 0
+    assert cube.total(cube.current_week, "count") == 2
+    assert cube.total(cube.current_year, "count") == 4
+    assert cube.total(cube.current_year - 1, "count") == 0
+    assert cube.total_before_last_event(cube.current_year, "count") == 3
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        # distance last year, distances this year, expect message
+        (10, [5, 4], False),
+        (10, [5, 5], True),
+        (10, [11, 1], False),
+    ],
+)
+def test_distance_previous_year(data):
+    distance_previous_year, distances, expected_result = data
+    events = _running_events(
+        [("2019-06-01", distance_previous_year)]
+        + [(f"2020-01-0{day + 1}", distance) for day, distance in enumerate(distances)]
+    )
+    context = cal.EvaluationContext(cal.get_dataframe(events))
+    actual_result = cal.distance_previous_year(context, utils.Sport.running) is not None
+    assert actual_result == expected_result
+
+
+def test_weekly_vs_year_fills_empty_weeks():
+    # Only two past weeks had more distance than the current week. All other
+    # past weeks had no distance at all.
+    events = _running_events(
+        [("2020-01-06", 20), ("2020-01-13", 20), ("2020-06-01", 5)]
+    )
+    context = cal.EvaluationContext(cal.get_dataframe(events))
+    assert cal.distance_weekly_vs_year(context, utils.Sport.running) is not None
+
+
+def test_evaluation_context(events):
+    running_events = cal.partition_events(events)[utils.Sport.running]
+    # Shuffled input is sorted by the context.
+    context = cal.EvaluationContext(cal.get_dataframe(running_events[::-1]))
+    assert context.current_date == pd.Timestamp("2020-01-07T07:30:00Z")
+    assert (context.current_year, context.current_month, context.current_week) == (
+        2020,
+        1,
+        2,
+    )
+    assert len(context.on_day(datetime.date(2020, 1, 5))) == 1
+    assert len(context.in_week(datetime.date(2020, 1, 8))) == 2
+    assert len(context.in_year(2020)) == 4
+    assert len(context.in_year(2019)) == 0
+    assert len(context.between(end=context.current_date)) == 3
+    assert cal.has_time_relevant_event(
+        context, utils.TriggerInterval.daily, datetime.date(2020, 1, 7)
+    )
+    assert not cal.has_time_relevant_event(
+        context, utils.TriggerInterval.daily, datetime.date(2020, 1, 4)
+    )
+
+
+def test_get_streaks():
+    days = np.array(
+        [
+            "2019-12-30",
+            "2019-12-31",
+            "2020-01-01",
+            "2020-01-05",
+            "2020-02-01",
+            "2020-02-02",
+            "2020-02-03",
+            "2020-02-04",
+            "2020-03-01",
+            "2020-03-02",
+        ],
+        dtype="datetime64[D]",
+    )
+    streaks = cal.get_streaks(days)
+    assert streaks.current == 2
+    assert streaks.longest == 4
+    assert streaks.longest_before_current == 4
+    assert streaks.yearly_longest == {2020: 4}
+
+
+@pytest.mark.parametrize("data", [(4, False), (5, True), (6, False)])
+def test_streak_record(data):
+    n_days, expected_result = data
+    events = _running_events(
+        [(f"2020-01-0{day}", 10) for day in [1, 2, 4, 5, 6, 7][:n_days]]
+    )
+    context = cal.EvaluationContext(cal.get_dataframe(events))
+    actual_result = cal.streak_record(context, utils.Sport.running, 2) is not None
+    assert actual_result == expected_result
+
+
+@pytest.mark.parametrize(
+    "days, expected",
+    [
+        # No prior streak: the record is announced once the streak is long enough.
+        ([1, 2], None),
+        ([1, 2, 3], 3),
+        ([1, 2, 3, 4], None),
+        # A prior streak below the threshold.
+        ([1, 3, 4, 5], 3),
+        ([1, 3, 4, 5, 6], None),
+        # A prior streak above the threshold.
+        ([1, 2, 3, 4, 6, 7, 8, 9], None),
+        ([1, 2, 3, 4, 6, 7, 8, 9, 10], 5),
+    ],
+)
+def test_streak_record_threshold(days, expected):
+    events = _running_events([(f"2020-01-{day:02d}", 10) for day in days])
+    context = cal.EvaluationContext(cal.get_dataframe(events))
+    message = cal.streak_record(context, utils.Sport.running)
+    if expected is None:
+        assert message is None
+    else:
+        assert f"streak of {expected} running" in message
+
+
+def test_plot_cumulative_day_distances(events):
+    running_events = cal.partition_events(events)[utils.Sport.running]
+    context = cal.EvaluationContext(cal.get_dataframe(running_events))
+    image = cal.plot_cumulative_day_distances(
+        context, utils.Sport.running, baselines=[1000], dpi=50
+    )
+    assert image.name == "cumulative_running.png"
+    assert image.getvalue().startswith(b"\x89PNG")
@@ -0,0 +1,42 @@
+import math
+import os
+
+# TODO: Get rid of path hack.
+import sys
+
+from benchmarks import fakes
+from monitoring import delivery
+
+sys.path.insert(0, os.path.abspath(".."))
+
+
+def test_send_order_and_single_session(tmp_path):
+    photo_path = tmp_path / "photo.png"
+    photo_path.write_bytes(b"png")
+    outbox = delivery.Outbox()
+    outbox.add_messages(["a", "b"])
+    outbox.add_photos([photo_path])
+    outbox.add_messages(["c"])
+    bot = fakes.TelegramBot(latency=0.01, messages_per_second=math.inf)
+
+    delivery.send(bot, 1, outbox, max_concurrency=2, messages_per_second=1000)
+
+    assert [(kind, payload) for _, kind, payload in bot.sent] == [
+        ("message", "a"),
+        ("message", "b"),
+        ("photo", len(b"png")),
+        ("message", "c"),
+    ]
+    assert bot.n_sessions == 1
+    assert bot.max_in_flight <= 2
+
+
+def test_send_retries_after_rate_limit():
+    outbox = delivery.Outbox()
+    outbox.add_messages(["a", "b", "c"])
+    bot = fakes.TelegramBot(messages_per_second=math.inf, n_rejections=2)
+
+    delivery.send(bot, 1, outbox, messages_per_second=1000)
+
+    assert sorted(text for _, _, text in bot.sent) == ["a", "b", "c"]
+    assert bot.n_rate_limits == 2
@@ -0,0 +1,60 @@
+import os
+
+# TODO: Get rid of path hack.
+import sys
+
+import pytest
+
+from benchmarks import fakes
+from monitoring import github
+
+sys.path.insert(0, os.path.abspath(".."))
+
+_REPO_URL = "https://api.github.com/repos/user/journal"
+
+
+def _sync(repository, target):
+    return github.sync_directory(
+        repository, "user", "journal", "main", "weeks", target, headers={}
+    )
+
+
+def test_git_blob_sha():
+    # As computed by ``git hash-object``.
+    assert github._git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+
+def test_sync_directory_only_downloads_changes(tmp_path):
+    repository = fakes.GitHubSession(
+        "weeks", {"01.org": b"* Monday", "02.org": b"* Tuesday"}
+    )
+    weeks_dir = _sync(repository, tmp_path)
+    assert (weeks_dir / "01.org").read_bytes() == b"* Monday"
+    assert (weeks_dir / "02.org").read_bytes() == b"* Tuesday"
+    assert sum("/git/blobs/" in url for url in repository.urls) == 2
+
+    # Unchanged commit: only the ref is resolved.
+    repository.urls = []
+    _sync(repository, tmp_path)
+    assert repository.urls == [f"{_REPO_URL}/commits/main"]
+
+    # Changed, added and removed files.
+    repository.urls = []
+    repository.push({"02.org": b"* Tuesday\n:DISTANCE: 5", "03.org": b"* Wed"})
+    _sync(repository, tmp_path)
+    assert sum("/git/blobs/" in url for url in repository.urls) == 2
+    assert sorted(path.name for path in weeks_dir.glob("*.org")) == [
+        "02.org",
+        "03.org",
+    ]
+    assert (weeks_dir / "02.org").read_bytes() == b"* Tuesday\n:DISTANCE: 5"
+
+
+def test_sync_directory_missing_directory(tmp_path):
+    repository = fakes.GitHubSession("weeks", {"01.org": b"* Monday"})
+    with pytest.raises(
+        FileNotFoundError, match=f"notes/weeks not found .* at {repository.commit}"
+    ):
+        github.sync_directory(
+            repository, "user", "journal", "main", "notes/weeks", tmp_path, headers={}
+        )
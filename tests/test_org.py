@@ -1,12 +1,17 @@
+import datetime
+import operator
 import os
 
 # TODO: Get rid of path hack.
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from monitoring import org
+from monitoring import org, store
 
 sys.path.insert(0, os.path.abspath(".."))
 
@@ -28,14 +33,262 @@ def numeric_series():
 )
 def test_has_daily_message(numeric_series, data):
     (sd, mean, n_days, is_negative, is_inverted, outcome) = data
+    deviation = 2 * sd if n_days == 1 else sd
     assert (
-        org._has_daily_message(
-            values=numeric_series.tail(n_days),
-            sigma=sd,
-            mean=mean,
-            n_days=n_days,
-            is_negative=is_negative,
-            is_inverted=is_inverted,
-        )
+        org._get_operators(
+            is_negative,
+            np.array([is_inverted]),
+            numeric_series.tail(n_days).to_numpy()[:, np.newaxis],
+            org._get_thresholds(
+                is_negative, np.array([is_inverted]), np.array([mean]), deviation
+            ),
+        ).all()
         == outcome
     )
+
+
+@pytest.mark.parametrize(
+    "last_two_days, expected",
+    [
+        ([[5, 1], [5, 1]], []),
+        ([[3, 3], [1, 3]], [("Sleep", org._NOT_GOOD_YESTERDAY)]),
+        # Right at one standard deviation on both days.
+        (
+            [[2, 4], [2, 4]],
+            [
+                ("Sleep", org._PROBLEMATIC_TWO_DAYS),
+                ("Stress", org._PROBLEMATIC_TWO_DAYS),
+            ],
+        ),
+        # Only the last day is compared with two standard deviations.
+        ([[3, 3], [3, 5]], [("Stress", org._NOT_GOOD_YESTERDAY)]),
+        (
+            [[0, 5], [1, 5]],
+            [
+                ("Sleep", org._NOT_GOOD_YESTERDAY),
+                ("Sleep", org._PROBLEMATIC_TWO_DAYS),
+                ("Stress", org._NOT_GOOD_YESTERDAY),
+                ("Stress", org._PROBLEMATIC_TWO_DAYS),
+            ],
+        ),
+    ],
+)
+def test_daily_messages(last_two_days, expected):
+    # Higher is better for Sleep, lower is better for Stress.
+    assert org._daily_messages(
+        ["Sleep", "Stress"],
+        np.array(last_two_days, dtype=float),
+        means=np.array([3.0, 3.0]),
+        sigmas=np.array([1.0, 1.0]),
+    ) == [(column, message.format(column)) for column, message in expected]
+
+
+def _write_week(week_root, week, sleep="3", fasting="16.5"):
+    days = "".join(
+        f"* Day {day}\n:PROPERTIES:\n:Sleep: {sleep}\n:Exercise: x\n"
+        f":Happiness: 4\n:Wellbeing: 4\n:Eating: 2\n:Stress: 1\n"
+        f":Fasting: {fasting}\n:END:\n"
+        for day in range(7)
+    )
+    (week_root / f"{week}.org").write_text("* Goals\n* Habits\n* Notes\n" + days)
+
+
+_WEEK_WITH_EDGE_CASES = """#+TITLE: Week
+* Goals
+** Nested
+:PROPERTIES:
+:Sleep: 1
+:END:
+* Habits
+*bold* text
+* Notes
+"""
+
+
+def test_load_data_engines_agree(tmp_path):
+    days = []
+    for day, (sleep, fasting) in enumerate(
+        [("3", "16.5"), ("x", "-1"), ("03", "x"), ("3x", "007"), ("5", "1.50")]
+        + [("0", "0")] * 2
+    ):
+        days.append(
+            f"* Day {day} :tag:\nSCHEDULED: <2024-01-01>\n  :PROPERTIES:  \n"
+            f"  :Sleep:  {sleep}  \n:Exercise: x\n:Happiness: 4\n:Wellbeing: 4\n"
+            f":Eating: 2\n:Stress: 1\n:Fasting: {fasting}\n:Other:\n:END:\n"
+            f"** Sub\n:PROPERTIES:\n:Sleep: 9\n:END:\n"
+        )
+    (tmp_path / "1.org").write_text(_WEEK_WITH_EDGE_CASES + "".join(days))
+    _write_week(tmp_path, 2)
+
+    expected = org.load_data(max_week=2, week_root=tmp_path, engine="orgparse")
+    df = org.load_data(max_week=2, week_root=tmp_path, engine="scanner")
+    pd.testing.assert_frame_equal(df, expected)
+    assert df.map(type).equals(expected.map(type))
+
+
+def test_load_data_process_pool(tmp_path):
+    for week in range(1, 10):
+        _write_week(tmp_path, week, sleep=str(week % 6))
+    expected = org.load_data(max_week=9, week_root=tmp_path)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        df = org.load_data(
+            max_week=9, week_root=tmp_path, executor=executor, chunksize=2
+        )
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_load_data_invalid_day(tmp_path):
+    _write_week(tmp_path, 1)
+    _write_week(tmp_path, 2, sleep="7")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError, match="week 2, day 1"):
+            org.load_data(max_week=2, week_root=tmp_path, executor=executor)
+
+
+def test_with_dates():
+    df = org.process_data(pd.DataFrame({"Sleep": ["3", "x"], "week": [1, 1]}))
+    year = org.year_of_week_dir(Path("/tmp/org/26-weeks"))
+    assert year == 2026
+    assert org.year_of_week_dir(Path("/tmp/org/journal")) == (
+        datetime.date.today().isocalendar().year
+    )
+    assert list(org.with_dates(df, year).index.date) == [
+        datetime.date(2025, 12, 29),
+        datetime.date(2025, 12, 30),
+    ]
+
+
+# The rules as they were evaluated column by column.
+def _reference_threshold(is_negative, is_inverted, mean, deviation):
+    return mean + (-1) ** (is_negative + is_inverted) * deviation
+
+
+def _reference_has_message(values, threshold, is_negative, is_inverted):
+    op = operator.le if is_negative != is_inverted else operator.ge
+    return op(values, threshold).all()
+
+
+def _reference_messages_this_week(df, lower_quantile=0.4, upper_quantile=0.6):
+    df_this_week = org._df_this_week(df)
+    messages = []
+    for column in org.PROPERTIES:
+        is_inverted = column == "Stress"
+        local_mean = df_this_week[column].mean()
+        if _reference_has_message(
+            local_mean, df[column].quantile(q=lower_quantile), True, is_inverted
+        ):
+            messages.append(org._NOT_GREAT_THIS_WEEK.format(column))
+        if _reference_has_message(
+            local_mean, df[column].quantile(q=upper_quantile), False, is_inverted
+        ):
+            messages.append(org._SPLENDID_THIS_WEEK.format(column))
+    return messages
+
+
+def _reference_messages_this_day(df):
+    messages = []
+    complete_days = df.dropna()
+    for column in org.PROPERTIES:
+        is_inverted = column == "Stress"
+        values = df[column].dropna().astype(float).tolist()
+        mean = sum(values) / len(values)
+        sigma = np.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+        if _reference_has_message(
+            complete_days.tail(1)[column],
+            _reference_threshold(True, is_inverted, mean, 2 * sigma),
+            True,
+            is_inverted,
+        ):
+            messages.append(org._NOT_GOOD_YESTERDAY.format(column))
+        if _reference_has_message(
+            complete_days.tail(2)[column],
+            _reference_threshold(True, is_inverted, mean, sigma),
+            True,
+            is_inverted,
+        ):
+            messages.append(org._PROBLEMATIC_TWO_DAYS.format(column))
+    return messages
+
+
+def _random_data(rng, n_weeks):
+    n_days = 7 * n_weeks
+    raw = {
+        column: rng.choice(["0", "1", "2", "3", "4", "5", "x"], n_days)
+        for column in org.PROPERTIES
+    }
+    raw["Fasting"] = np.where(
+        rng.random(n_days) < 0.1, "x", (rng.random(n_days) * 25 - 1).round(1)
+    )
+    raw["week"] = np.repeat(np.arange(1, n_weeks + 1), 7)
+    return org.process_data(pd.DataFrame(raw))
+
+
+def test_messages_match_reference(monkeypatch):
+    rng = np.random.default_rng(0)
+    n_messages = 0
+    for _ in range(100):
+        n_weeks = int(rng.integers(1, 53))
+        df = _random_data(rng, n_weeks)
+        monkeypatch.setattr(org, "_this_week", lambda: n_weeks)
+        messages = org.messages_this_week(df)
+        assert messages == _reference_messages_this_week(df)
+        assert org.messages_this_day(df) == _reference_messages_this_day(df)
+        n_messages += len(messages)
+    assert n_messages > 0
+
+
+def test_messages_with_running_statistics(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    df = _random_data(rng, 40)
+    statistics_store = store.StatisticsStore(tmp_path / "statistics.json")
+    for n_weeks in [20, 21, 22, 40]:
+        df_weeks = df[df["week"] <= n_weeks]
+        monkeypatch.setattr(org, "_this_week", lambda: n_weeks)
+        statistics = org.baseline_statistics(df_weeks, statistics_store, verify=True)
+        assert org.messages_this_week(
+            df_weeks, statistics=statistics
+        ) == org.messages_this_week(df_weeks)
+        assert org.messages_this_day(
+            df_weeks, statistics=statistics
+        ) == org.messages_this_day(df_weeks)
+        assert statistics_store.load()["n_rows"] == 7 * (n_weeks - 1)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_running_statistics_at_threshold(tmp_path, monkeypatch, seed):
+    # Balanced scores of 1 and 3 have a mean of 2 and a deviation of 1, such
+    # that two days of 1 sit right at the threshold of the two-day rule.
+    n_weeks = 30
+    n_ones = 7 * n_weeks // 2
+    scores = np.concatenate(
+        [
+            np.random.default_rng(seed).permutation(
+                np.repeat(["1", "3"], [n_ones - 2, 7 * n_weeks - n_ones])
+            ),
+            ["1", "1"],
+        ]
+    )
+    raw = {column: scores for column in org.PROPERTIES}
+    raw["week"] = np.repeat(np.arange(1, n_weeks + 1), 7)
+    df = org.process_data(pd.DataFrame(raw))
+    statistics_store = store.StatisticsStore(tmp_path / "statistics.json")
+    monkeypatch.setattr(org, "_this_week", lambda: n_weeks)
+    for n_weeks_persisted in [10, 20]:
+        org.baseline_statistics(
+            df[df["week"] <= n_weeks_persisted], statistics_store, verify=True
+        )
+    statistics = org.baseline_statistics(df, statistics_store, verify=True)
+
+    messages = org.messages_this_day(df)
+    assert org._PROBLEMATIC_TWO_DAYS.format("Sleep") in messages
+    assert org.messages_this_day(df, statistics=statistics) == messages
+
+
+@pytest.mark.parametrize("n_weeks", [1, 3])
+def test_images_this_week_with_missing_values(monkeypatch, n_weeks):
+    df = _random_data(np.random.default_rng(2), n_weeks)
+    # No value at all in a score column.
+    df["Sleep"] = pd.array([pd.NA] * len(df), dtype="UInt8")
+    monkeypatch.setattr(org, "_this_week", lambda: n_weeks)
+    (image,) = org.images_this_week(df)
+    assert image.name == "this_week.png"
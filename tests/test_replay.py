@@ -0,0 +1,115 @@
+import datetime
+import os
+
+# TODO: Get rid of path hack.
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitoring import cal, org, replay, utils
+
+sys.path.insert(0, os.path.abspath(".."))
+
+_FIRST_DATE = datetime.date(2020, 1, 1)
+_LAST_DATE = datetime.date(2021, 2, 28)
+
+
+@pytest.fixture(scope="module")
+def events():
+    rng = np.random.default_rng(42)
+    events = []
+    for offset in range((_LAST_DATE - _FIRST_DATE).days + 1):
+        date = _FIRST_DATE + datetime.timedelta(days=offset)
+        for summary in ["Running", "Gym: lb"]:
+            if rng.random() < 0.4:
+                events.append(
+                    {
+                        "summary": summary,
+                        "description": f"{rng.uniform(2, 20):.1f} km",
+                        "start": {"dateTime": f"{date}T08:30:00+01:00"},
+                    }
+                )
+    return events
+
+
+def _replay_calendar_naively(events, interval):
+    rows = []
+    for sport, sport_events in cal.partition_events(events).items():
+        message_functions = cal.message_function_registry(sport, interval)
+        if len(sport_events) == 0 or len(message_functions) == 0:
+            continue
+        df = cal.get_dataframe(sport_events)
+        for date in pd.date_range(_FIRST_DATE, _LAST_DATE):
+            df_as_of = df[df.index < date.tz_localize("UTC") + pd.Timedelta(days=1)]
+            if interval == utils.TriggerInterval.weekly and date.weekday() != 6:
+                continue
+            if len(df_as_of) == 0:
+                continue
+            context = cal.EvaluationContext(df_as_of)
+            if not cal.has_time_relevant_event(context, interval, date.date()):
+                continue
+            for message_function in message_functions:
+                if (message := message_function(context)) is not None:
+                    rows.append(
+                        (
+                            date.date(),
+                            sport.value,
+                            message_function.func.__name__,
+                            message,
+                        )
+                    )
+    return pd.DataFrame(
+        rows, columns=["date", "subject", "rule", "message"]
+    ).sort_values(["date", "subject"], kind="stable", ignore_index=True)
+
+
+@pytest.mark.parametrize("interval", list(utils.TriggerInterval))
+def test_replay_calendar(events, interval):
+    expected = _replay_calendar_naively(events, interval)
+    actual = replay.replay_calendar(events, _FIRST_DATE, _LAST_DATE, interval)
+    assert len(actual) > 0
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize(
+    "seed, choices",
+    [
+        (0, [0, 1, 2, 3, 4, 5]),
+        # Two values make scores right at the thresholds common.
+        *[(seed, [1, 3]) for seed in range(5)],
+    ],
+)
+def test_replay_org_daily(seed, choices):
+    rng = np.random.default_rng(seed)
+    values = rng.choice(choices, size=(28 * 4, len(org.PROPERTIES))).astype(float)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    df = pd.DataFrame(values, columns=org.PROPERTIES)
+    df["week"] = df.index // 7 + 1
+
+    expected = [
+        message
+        for n_days in range(1, len(df) + 1)
+        if len(df.iloc[:n_days].dropna()) > 0
+        for message in org.messages_this_day(df.iloc[:n_days])
+    ]
+    actual = replay.replay_org(df, 2020, utils.TriggerInterval.daily)
+    assert actual["message"].tolist() == expected
+    assert set(actual["date"]) <= set(org.with_dates(df, 2020).index.date)
+
+
+def test_replay_org_weekly(monkeypatch):
+    rng = np.random.default_rng(1)
+    values = rng.integers(0, 6, size=(28, len(org.PROPERTIES))).astype(float)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    df = pd.DataFrame(values, columns=org.PROPERTIES)
+    df["week"] = df.index // 7 + 1
+
+    expected = []
+    for week in range(1, 5):
+        monkeypatch.setattr(org, "_this_week", lambda: week)
+        expected += org.messages_this_week(df[df["week"] <= week])
+    actual = replay.replay_org(df, 2020, utils.TriggerInterval.weekly)
+    assert len(actual) > 0
+    assert actual["message"].tolist() == expected
@@ -0,0 +1,89 @@
+import os
+
+# TODO: Get rid of path hack.
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from monitoring import setup
+
+sys.path.insert(0, os.path.abspath(".."))
+
+
+def test_get_bot_is_cached(monkeypatch):
+    monkeypatch.setattr(setup, "_clients", {})
+    monkeypatch.setenv("telegram_token", "123:abc")
+    bot = setup.get_bot()
+    assert setup.get_bot() is bot
+
+    monkeypatch.setenv("telegram_token", "456:def")
+    assert setup.get_bot() is not bot
+
+
+def test_get_calendar_service_is_cached(monkeypatch):
+    monkeypatch.setattr(setup, "_clients", {})
+    for key in [
+        "google_refresh_token",
+        "google_token_uri",
+        "google_client_id",
+        "google_client_secret",
+    ]:
+        monkeypatch.setenv(key, key)
+    service = setup.get_calendar_service()
+    assert setup.get_calendar_service() is service
+
+
+def test_tenants(monkeypatch, tmp_path):
+    monkeypatch.setattr(setup, "_clients", {})
+    monkeypatch.setenv("telegram_token", "123:abc")
+    monkeypatch.setenv("telegram_owner_id", "1")
+    monkeypatch.setenv("event_store_dir", str(tmp_path / "events"))
+    monkeypatch.setenv("github_username", "user")
+    monkeypatch.setenv("github_repo", "journal")
+    monkeypatch.delenv("tenants_file", raising=False)
+    assert setup.get_tenants() is None
+
+    tenants_file = tmp_path / "tenants.json"
+    tenants_file.write_text('{"a": {"telegram_owner_id": "2"}, "b": {}}')
+    monkeypatch.setenv("tenants_file", str(tenants_file))
+    tenant_a, tenant_b = setup.get_tenants()
+
+    bot = setup.get_bot()
+    with setup.tenant_context(tenant_a):
+        assert setup.get_telegram_owner_id() == "2"
+        assert setup.get_event_store().root == tmp_path / "events" / "a"
+        statistics_path = setup.get_statistics_store(2024).path
+        bot_a = setup.get_bot()
+        assert bot_a is not bot
+        assert setup.get_bot() is bot_a
+    with setup.tenant_context(tenant_b):
+        assert setup.get_telegram_owner_id() == "1"
+        # Both tenants mirror the same repository.
+        assert setup.get_statistics_store(2024).path != statistics_path
+        assert setup.get_bot() is not bot_a
+    assert setup.get_telegram_owner_id() == "1"
+    assert setup.get_bot() is bot
+
+
+def test_discovery_document_is_shared(monkeypatch):
+    monkeypatch.setattr(setup, "_clients", {})
+    document = setup._get_discovery_document()
+    with setup.tenant_context(setup.Tenant("a", {})):
+        assert setup._get_discovery_document() is document
+
+
+def test_clients_are_created_once(monkeypatch):
+    monkeypatch.setattr(setup, "_clients", {})
+    n_created = []
+
+    def factory():
+        n_created.append(1)
+        time.sleep(0.01)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = set(
+            executor.map(lambda _: setup._get_client(("slow",), factory), range(8))
+        )
+    assert len(n_created) == 1
+    assert len(clients) == 1
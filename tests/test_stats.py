@@ -0,0 +1,85 @@
+import os
+
+# TODO: Get rid of path hack.
+import sys
+
+import numpy as np
+import pytest
+
+from monitoring import stats, store
+
+sys.path.insert(0, os.path.abspath(".."))
+
+
+def _values(rng, n_rows, n_columns=3):
+    values = rng.integers(0, 6, (n_rows, n_columns)).astype(float)
+    values[:, -1] = (rng.random(n_rows) * 24).round(1)
+    values[rng.random((n_rows, n_columns)) < 0.1] = np.nan
+    return values
+
+
+@pytest.mark.parametrize("n_values", [1, 2, 7, 100])
+def test_running_statistics_match_numpy(n_values):
+    rng = np.random.default_rng(n_values)
+    values = _values(rng, n_values, n_columns=1)[:, 0]
+    present = values[~np.isnan(values)]
+    running = stats.RunningStatistics.of(values)
+    assert running.count == len(present)
+    mean, std = running.moments()
+    if len(present) == 0:
+        assert np.isnan(mean) and np.isnan(std)
+        return
+    assert mean == pytest.approx(present.mean())
+    assert std == pytest.approx(present.std())
+    for q in [0, 0.4, 0.5, 0.6, 1]:
+        assert running.quantile(q) == np.quantile(present, q)
+
+
+def test_moments_are_exact():
+    # A naive sum of a tenth ten times isn't one.
+    values = np.array([0.1] * 10 + [1.0] * 10)
+    running = stats.RunningStatistics.of(values)
+    assert running.moments() == stats.RunningStatistics.of(values[::-1]).moments()
+    assert running.moments() == (0.55, 0.45)
+
+
+def test_merge_and_serialization():
+    rng = np.random.default_rng(0)
+    values = _values(rng, 50, n_columns=1)[:, 0]
+    running = stats.RunningStatistics.of(values[:20]).merge(
+        stats.RunningStatistics.of(values[20:])
+    )
+    expected = stats.RunningStatistics.of(values)
+    assert running == expected
+    assert running.moments() == expected.moments()
+    assert stats.RunningStatistics.from_dict(expected.to_dict()) == expected
+
+
+def test_update_statistics(tmp_path, capsys):
+    statistics_store = store.StatisticsStore(tmp_path / "statistics.json")
+    columns = ["a", "b", "c"]
+    values = _values(np.random.default_rng(1), 70)
+    quantiles = [0.4, 0.6]
+
+    statistics = stats.update_statistics(statistics_store, columns, values, 49)
+    assert "from scratch" in capsys.readouterr().out
+    assert stats.is_consistent(statistics, values, quantiles)
+    assert statistics_store.load()["n_rows"] == 49
+
+    # Only the new rows are added.
+    statistics = stats.update_statistics(statistics_store, columns, values, 63)
+    assert "from scratch" not in capsys.readouterr().out
+    assert stats.is_consistent(statistics, values, quantiles)
+    assert not stats.is_consistent(statistics, values[:-1], quantiles)
+
+    # Persisted rows changed.
+    values[0] = 5
+    statistics = stats.update_statistics(statistics_store, columns, values, 63)
+    assert "Persisted rows changed" in capsys.readouterr().out
+    assert stats.is_consistent(statistics, values, quantiles)
+
+    for corrupt in ['{"version": 1}', "{", '{"version": 1, "columns": 3}']:
+        statistics_store.path.write_text(corrupt)
+        statistics = stats.update_statistics(statistics_store, columns, values, 63)
+        assert "from scratch" in capsys.readouterr().out
+        assert stats.is_consistent(statistics, values, quantiles)
@@ -0,0 +1,68 @@
+import datetime
+import os
+
+# TODO: Get rid of path hack.
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitoring import store
+
+sys.path.insert(0, os.path.abspath(".."))
+
+
+def test_event_store_roundtrip(tmp_path):
+    event_store = store.EventStore(tmp_path / "events")
+    assert event_store.load_events() == {}
+    assert event_store.load_sync_token() is None
+
+    events = {"a": {"id": "a", "summary": "Running"}}
+    event_store.save(events, "token")
+    assert event_store.load_events() == events
+    assert event_store.load_sync_token() == "token"
+
+    event_store.save(events, None)
+    assert event_store.load_sync_token() is None
+
+
+def _days(first_date, n_days):
+    dates = pd.date_range(first_date, periods=n_days, freq="D", name="date")
+    return pd.DataFrame(
+        {
+            "Sleep": pd.array(np.arange(n_days) % 6, dtype="UInt8"),
+            "Fasting": np.linspace(-1, 20, n_days, dtype=np.float32),
+        },
+        index=dates,
+    )
+
+
+def test_day_store(tmp_path, monkeypatch):
+    day_store = store.DayStore(tmp_path / "days")
+    # ISO year 2024 starts on 2024-01-01, 2025 on 2024-12-30.
+    df_2024 = _days("2024-01-01", 364)
+    df_2025 = _days("2024-12-30", 364)
+    df_2025.loc["2025-02-01", "Sleep"] = pd.NA
+    day_store.save_year(2024, df_2024)
+    day_store.save_year(2025, df_2025)
+    assert day_store.years() == [2024, 2025]
+
+    with pytest.raises(ValueError, match="ISO year 2025"):
+        day_store.save_year(2025, df_2024)
+
+    pd.testing.assert_frame_equal(
+        day_store.load(), pd.concat([df_2024, df_2025]), check_freq=False
+    )
+
+    loaded_years = []
+    load_year = day_store.load_year
+    monkeypatch.setattr(
+        day_store,
+        "load_year",
+        lambda year: loaded_years.append(year) or load_year(year),
+    )
+    df = day_store.load(start=datetime.date(2025, 1, 10))
+    assert loaded_years == [2025]
+    pd.testing.assert_frame_equal(df, df_2025.loc["2025-01-10":], check_freq=False)
+    assert len(day_store.load(end=datetime.date(2023, 12, 31))) == 0
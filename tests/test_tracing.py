@@ -0,0 +1,79 @@
+import json
+import os
+
+# TODO: Get rid of path hack.
+import sys
+import threading
+
+import pytest
+
+from monitoring import tracing
+
+sys.path.insert(0, os.path.abspath(".."))
+
+
+def _log_lines(capsys) -> list[dict]:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_stages_and_summary(capsys, monkeypatch):
+    monkeypatch.delenv("profile_dir", raising=False)
+    with tracing.run():
+        tracing.set_fields(trigger="org_daily")
+        with tracing.stage("fetch"):
+            tracing.count("github_api_calls", 2)
+            with tracing.stage("parse", week=1):
+                tracing.count("rows", 7)
+        with pytest.raises(ValueError):
+            with tracing.stage("send"):
+                raise ValueError("no chat")
+
+    parse, fetch, send, summary = _log_lines(capsys)
+    assert parse["stage"] == "parse"
+    assert (parse["week"], parse["rows"], parse["trigger"]) == (1, 7, "org_daily")
+    assert fetch["github_api_calls"] == 2
+    assert "rows" not in fetch
+    assert (send["severity"], send["error"]) == ("ERROR", "ValueError('no chat')")
+    assert set(summary["stages"]) == {"fetch", "parse", "send"}
+    assert summary["counters"] == {"github_api_calls": 2, "rows": 7}
+    assert summary["duration_s"] >= summary["stages"]["fetch"]
+
+
+def test_concurrent_runs(capsys, monkeypatch):
+    monkeypatch.delenv("profile_dir", raising=False)
+    barrier = threading.Barrier(2)
+
+    def run(trigger, n_rows):
+        with tracing.run():
+            tracing.set_fields(trigger=trigger)
+            with tracing.stage(trigger):
+                # Both runs are in progress at once.
+                barrier.wait()
+                tracing.count("rows", n_rows)
+                barrier.wait()
+
+    threads = [
+        threading.Thread(target=run, args=args)
+        for args in [("org_daily", 7), ("calendar_daily", 3)]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summaries = {
+        line["trigger"]: line for line in _log_lines(capsys) if "stages" in line
+    }
+    for trigger, n_rows in [("org_daily", 7), ("calendar_daily", 3)]:
+        assert list(summaries[trigger]["stages"]) == [trigger]
+        assert summaries[trigger]["counters"] == {"rows": n_rows}
+
+
+def test_profile(capsys, monkeypatch, tmp_path):
+    monkeypatch.setenv("profile_dir", str(tmp_path))
+    with tracing.run():
+        tracing.set_fields(trigger="calendar_weekly")
+        sum(range(1000))
+    profile_line, _ = _log_lines(capsys)
+    assert profile_line["profile"].startswith(str(tmp_path / "calendar_weekly-"))
+    assert [path.suffix for path in tmp_path.iterdir()] == [".prof"]